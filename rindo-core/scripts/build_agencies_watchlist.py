@@ -13,12 +13,17 @@
 from __future__ import annotations
 
 import argparse
-import collections
+import asyncio
+import concurrent.futures
+import contextlib
 import dataclasses
+import functools
+import itertools
 import json
+import multiprocessing
+import os
 import re
 import sys
-import time
 from urllib.parse import urljoin, urlparse
 
 import httpx
@@ -46,10 +51,19 @@ RE_DATE = re.compile(
     r"(20\d{2})\s*[./年-]\s*(\d{1,2})\s*[./月-]\s*(\d{1,2})\s*(?:日)?"
 )
 RE_PDF = re.compile(r"\.pdf($|\?)", re.IGNORECASE)
+# スコアリングで見る本文の上限(自治体ページは冒頭に要旨と日付があることが多い)
+TEXT_SCAN_LIMIT = 8192
 
 # polite
 TIMEOUT = httpx.Timeout(15.0, connect=10.0)
+# HTTP/2 では同一オリジンへの並行リクエストが 1 接続のストリームに多重化される。
+# seed をまたいで接続を使い回せるよう keep-alive 枠は接続上限と同じにしておく
+LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=64)
 HEADERS = {"User-Agent": "rindo-watchlist-builder/1.0 (+local)"}
+POLITE_DELAY = 0.4       # 同一ホストへの連続アクセス間隔(秒)
+GLOBAL_CONCURRENCY = 32  # 全体の同時リクエスト数
+HOST_CONCURRENCY = 8     # ホストごとの同時リクエスト数
+WORKERS_PER_SEED = 8     # seed ごとのクロールワーカー数
 
 @dataclasses.dataclass
 class Seed:
@@ -69,6 +83,7 @@ class Candidate:
 def norm_site(u: str) -> str:
     return (u or "").strip()
 
+@functools.lru_cache(maxsize=65536)
 def host_of(u: str) -> str:
     try:
         h = urlparse(u).hostname or ""
@@ -76,12 +91,24 @@ def host_of(u: str) -> str:
         return ""
     return h.lower()
 
-def within_allowed(url: str, allowed: set[str]) -> bool:
-    h = host_of(url)
+def host_allowed(h: str, allowed: set[str]) -> bool:
     return (h in allowed) or any(h.endswith("." + d) for d in allowed)
 
-def extract_links(base_url: str, html: str) -> list[str]:
-    tree = HTMLParser(html)
+def within_allowed(url: str, allowed: set[str]) -> bool:
+    return host_allowed(host_of(url), allowed)
+
+def allowed_prefixes(allowed: set[str]) -> tuple[str, ...]:
+    return tuple(f"{scheme}://{d}/" for d in sorted(allowed) if d for scheme in ("https", "http"))
+
+def host_fast(url: str, prefixes: tuple[str, ...]) -> str:
+    """許可ホスト直下の URL なら文字列だけでホストを切り出す(それ以外は host_of)"""
+    if url.startswith(prefixes):
+        rest = url.split("//", 1)[1]
+        return rest[:rest.index("/")]
+    return host_of(url)
+
+# 1ページにつき HTMLParser は1回だけ作り、以下の関数で共有する
+def extract_links(base_url: str, tree: HTMLParser) -> list[str]:
     out = []
     for a in tree.css("a"):
         href = (a.attributes.get("href") or "").strip()
@@ -91,21 +118,19 @@ def extract_links(base_url: str, html: str) -> list[str]:
         out.append(absu)
     return out
 
-def page_title(html: str) -> str:
-    tree = HTMLParser(html)
+def page_title(tree: HTMLParser) -> str:
     t = tree.css_first("title")
     if t and t.text():
         return t.text().strip()
     h1 = tree.css_first("h1")
     return h1.text().strip() if h1 else ""
 
-def page_text(html: str) -> str:
-    tree = HTMLParser(html)
-    # 不要UIを軽く間引き
+def page_text(tree: HTMLParser) -> str:
+    # 不要UIを軽く間引き(tree を書き換えるのでリンク/タイトル取得の後に呼ぶ)
     for sel in ("script", "style", "nav", "header", "footer"):
         for n in tree.css(sel):
             n.decompose()
-    return tree.text(separator=" ").strip()
+    return tree.text(separator=" ").strip()[:TEXT_SCAN_LIMIT]
 
 def date_recency_bonus(text: str) -> float:
     # 今年～昨年なら+、古いなら控えめ
@@ -118,16 +143,16 @@ def date_recency_bonus(text: str) -> float:
             bonus = max(bonus, 1.5)
     return bonus
 
-def score_page(url: str, html: str | None) -> Candidate:
+def score_page(url: str, tree: HTMLParser | None) -> Candidate:
     base = 0.0
     url_hit = bool(RE_URL.search(url))
     if url_hit:
         base += 2.0
     is_pdf = bool(RE_PDF.search(url))
     title = ""
-    if html:
-        title = page_title(html)
-        txt = (title + "\n" + page_text(html)) if html else ""
+    if tree is not None:
+        title = page_title(tree)
+        txt = (title + "\n" + page_text(tree))[:TEXT_SCAN_LIMIT]
         hits = len(RE_TEXT.findall(txt))
         base += min(hits * 0.8, 8.0)
         if any(k in title for k in ("通行", "規制", "林道", "道路", "お知らせ")):
@@ -138,41 +163,93 @@ def score_page(url: str, html: str | None) -> Candidate:
         base += 1.0
     return Candidate(url=url, score=base, title=title, is_pdf=is_pdf)
 
-def crawl_one(client: httpx.Client, seed: Seed, depth: int, max_pages: int, per_host_limit: int = 80) -> list[Candidate]:
+async def read_html(r: httpx.Response, ctype: str, url: str) -> str | None:
+    """HTML なら本文を返す。content-type が当てにならない応答は先頭 200 バイトで判定し、違えば残りは読まない"""
+    if "text/html" in ctype:
+        await r.aread()
+        return r.text
+    if "application/pdf" in ctype or ctype.startswith(("image/", "audio/", "video/")) or RE_PDF.search(url):
+        return None
+    buf = bytearray()
+    chunks = r.aiter_bytes()
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) >= 200:
+            break
+    if b"<html" not in bytes(buf[:200]).lower():
+        return None
+    async for chunk in chunks:  # 同じイテレータで続きを読む
+        buf += chunk
+    return bytes(buf).decode(r.encoding or "utf-8", errors="replace")
+
+class HostLimiter:
+    """全体 + ホスト単位の同時実行数を絞り、ホストごとに polite な間隔を空ける"""
+
+    def __init__(self, global_limit: int = GLOBAL_CONCURRENCY, per_host: int = HOST_CONCURRENCY, delay: float = POLITE_DELAY):
+        self._global = asyncio.Semaphore(global_limit)
+        self._per_host = per_host
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._delay = delay
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host: str):
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self._per_host)
+        async with sem:
+            async with self._global:
+                yield
+            # polite: ホスト枠は少し寝てから返す(全体枠は先に解放)
+            await asyncio.sleep(self._delay)
+
+async def crawl_one(client: httpx.AsyncClient, seed: Seed, depth: int, max_pages: int, limiter: HostLimiter,
+                    per_host_limit: int = 80, workers: int = WORKERS_PER_SEED) -> list[Candidate]:
     start = seed.site
     allowed = {host_of(start)} | set(seed.extra_domains)
-    q = collections.deque([(start, 0)])
-    seen = set()
-    per_host = collections.Counter()
+    prefixes = allowed_prefixes(allowed)
+    # URL だけで付けた仮スコアの高い順に取り出す(同点は投入順)
+    q: asyncio.PriorityQueue[tuple[float, int, str, int]] = asyncio.PriorityQueue()
+    tie = itertools.count()
+
+    def enqueue(link: str, d: int) -> None:
+        url_score = 2.0 if RE_URL.search(link) else 0.0
+        q.put_nowait((-url_score, next(tie), link, d))
+
+    enqueue(start, 0)
+    seen: set[int] = set()  # URL 文字列ではなく hash 値で持つ(frontier が大きくなってもメモリが軽い)
+    per_host: dict[str, int] = {}
     cands: dict[str, Candidate] = {}
 
-    while q and len(seen) < max_pages:
-        url, d = q.popleft()
-        if url in seen:
-            continue
-        seen.add(url)
-        if not within_allowed(url, allowed):
-            continue
-        h = host_of(url)
-        if per_host[h] >= per_host_limit:
-            continue
-        per_host[h] += 1
-
+    async def visit(url: str, d: int) -> None:
+        key = hash(url)
+        if key in seen or len(seen) >= max_pages:
+            return
+        seen.add(key)
+        h = host_fast(url, prefixes)
+        if not host_allowed(h, allowed):
+            return
+        n = per_host.get(h, 0)
+        if n >= per_host_limit:
+            return
+        per_host[h] = n + 1
+
+        # ヘッダを先に見て、HTML のときだけ本文を読む(PDF/画像はダウンロードしない)
         try:
-            r = client.get(url, timeout=TIMEOUT, headers=HEADERS, follow_redirects=True)
+            async with limiter.slot(h):
+                async with client.stream("GET", url, timeout=TIMEOUT, headers=HEADERS, follow_redirects=True) as r:
+                    ctype = (r.headers.get("content-type") or "").lower()
+                    html = await read_html(r, ctype, url)
         except Exception:
-            continue
+            return
 
-        ctype = (r.headers.get("content-type") or "").lower()
-        html = None
-        if "text/html" in ctype or "<html" in r.text[:200].lower():
-            html = r.text
-            cand = score_page(url, html)
+        if html is not None:
+            tree = HTMLParser(html) if html else None
+            links = extract_links(url, tree) if (tree is not None and d < depth) else []
+            cand = score_page(url, tree)
             cands[url] = cand
-            if d < depth:
-                for link in extract_links(url, html):
-                    if link not in seen:
-                        q.append((link, d + 1))
+            for link in links:
+                if hash(link) not in seen:
+                    enqueue(link, d + 1)
         elif "application/pdf" in ctype or RE_PDF.search(url):
             cand = score_page(url, None)
             cands[url] = cand
@@ -180,9 +257,103 @@ def crawl_one(client: httpx.Client, seed: Seed, depth: int, max_pages: int, per_
             # 他のMIMEは無視
             pass
 
+    async def worker() -> None:
+        while True:
+            _, _, url, d = await q.get()
+            try:
+                await visit(url, d)
+            finally:
+                q.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+    try:
+        await q.join()
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     # スコアで降順
     return sorted(cands.values(), key=lambda c: c.score, reverse=True)
 
+async def crawl_seed(client: httpx.AsyncClient, s: Seed, depth: int, max_pages: int, limiter: HostLimiter) -> list[Candidate]:
+    header = f"[crawl] {s.pref} / {s.agency_type} / {s.city or '-'} :: {s.site}"
+    try:
+        cands = await crawl_one(client, s, depth=depth, max_pages=max_pages, limiter=limiter)
+    except Exception as e:
+        print(header)
+        print("  ! error:", e)
+        return []
+    # 並行実行なので seed 単位でまとめて出力
+    print(header)
+    # デバッグ出力(上位のみ)
+    for c in cands[:10]:
+        print(f"    score={c.score:>4.1f}  {'[PDF] ' if c.is_pdf else ''}{c.url}  {(' :: '+c.title) if c.title else ''}")
+    return cands
+
+async def crawl_all(seeds: list[Seed], depth: int, max_pages: int,
+                    global_limit: int = GLOBAL_CONCURRENCY) -> dict[str, list[Candidate]]:
+    limiter = HostLimiter(global_limit=global_limit)
+    # trust_env=False: プロキシ等の環境変数をリクエストごとに調べない
+    async with httpx.AsyncClient(http2=True, headers=HEADERS, limits=LIMITS, timeout=TIMEOUT, trust_env=False) as client:
+        got = await asyncio.gather(*(crawl_seed(client, s, depth, max_pages, limiter) for s in seeds))
+    return {s.site: cands for s, cands in zip(seeds, got)}
+
+def seed_domains(s: Seed) -> set[str]:
+    """seed がクロールで触りうるホスト(開始ホスト + extra_domains)"""
+    return {d for d in ({host_of(s.site)} | {d.lower() for d in s.extra_domains}) if d}
+
+def shard_seeds(seeds: list[Seed], n: int) -> list[list[Seed]]:
+    """触りうるホストが重なる seed は同じシャードへ(ホスト単位の同時数/間隔制限をプロセス内で効かせるため)"""
+    seeds = sorted(seeds, key=lambda s: (host_of(s.site), s.site))
+    parent = list(range(len(seeds)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # host_allowed はサブドメインも許すので、同じホストか一方が他方のサブドメインなら重なりとみなす
+    owner: dict[str, int] = {}
+    for i, s in enumerate(seeds):
+        for d in seed_domains(s):
+            owner.setdefault(d, i)
+            parent[find(i)] = find(owner[d])
+    doms = list(owner)
+    for a in doms:
+        for b in doms:
+            if a != b and a.endswith("." + b):
+                parent[find(owner[a])] = find(owner[b])
+
+    groups: dict[int, list[Seed]] = {}
+    for i, s in enumerate(seeds):
+        groups.setdefault(find(i), []).append(s)
+    shards: list[list[Seed]] = [[] for _ in range(max(1, n))]
+    # 大きいグループから順に、いちばん軽いシャードへ詰める
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(shards, key=len).extend(group)
+    return [sh for sh in shards if sh]
+
+def crawl_shard(seeds: list[Seed], depth: int, max_pages: int,
+                global_limit: int = GLOBAL_CONCURRENCY) -> dict[str, list[Candidate]]:
+    # ワーカープロセスごとに専用のイベントループ + クライアントを持つ
+    return asyncio.run(crawl_all(seeds, depth=depth, max_pages=max_pages, global_limit=global_limit))
+
+def crawl_parallel(seeds: list[Seed], depth: int, max_pages: int, workers: int) -> dict[str, list[Candidate]]:
+    shards = shard_seeds(seeds, workers)
+    if len(shards) <= 1:
+        return crawl_shard(seeds, depth, max_pages)
+    # 全体の同時リクエスト数はプロセス数で割り、マシン全体で GLOBAL_CONCURRENCY を超えないようにする
+    n = len(shards)
+    per_shard = max(1, GLOBAL_CONCURRENCY // n)
+    results: dict[str, list[Candidate]] = {}
+    ctx = multiprocessing.get_context("spawn")  # Windows と挙動を揃える
+    with concurrent.futures.ProcessPoolExecutor(max_workers=n, mp_context=ctx) as ex:
+        for part in ex.map(crawl_shard, shards, [depth] * n, [max_pages] * n, [per_shard] * n):
+            results.update(part)
+    return results
+
 def read_json(path: str) -> dict | list:
     import pathlib
     p = pathlib.Path(path)
@@ -259,6 +430,9 @@ def main():
     ap.add_argument("--watch-top", type=int, default=5, help="Top-N URLs to add to 'watch' (default: 5)")
     ap.add_argument("--agencies-out", default="registry/agencies.json", help="Output agencies.json path")
     ap.add_argument("--dry-run", action="store_true", help="Do not write agencies.json, just print.")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help=f"Crawler processes (default: CPU count). Seeds sharing a host stay in one process; "
+                         f"the {GLOBAL_CONCURRENCY} in-flight requests in total are split across processes")
     args = ap.parse_args()
 
     seeds = load_seeds(args.seeds)
@@ -266,20 +440,7 @@ def main():
         print("no seeds.")
         return 0
 
-    results: dict[str, list[Candidate]] = {}
-    with httpx.Client(http2=True, headers=HEADERS) as client:
-        for s in seeds:
-            print(f"[crawl] {s.pref} / {s.agency_type} / {s.city or '-'} :: {s.site}")
-            try:
-                cands = crawl_one(client, s, depth=args.depth, max_pages=args.max_pages)
-            except Exception as e:
-                print("  ! error:", e)
-                cands = []
-            # デバッグ出力(上位のみ)
-            for c in cands[:10]:
-                print(f"    score={c.score:>4.1f}  {'[PDF] ' if c.is_pdf else ''}{c.url}  {(' :: '+c.title) if c.title else ''}")
-            results[s.site] = cands
-            time.sleep(0.4)  # polite
+    results = crawl_parallel(seeds, depth=args.depth, max_pages=args.max_pages, workers=args.workers)
 
     existing = read_json(args.agencies_out)
     merged = merge_into_agencies(existing, seeds, results, watch_top=args.watch_top)
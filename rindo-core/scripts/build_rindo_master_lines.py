@@ -10,12 +10,35 @@
 #  - POSITIVE/NEGATIVE ルール群（下の定数）
 #
 # 依存: pyosmium (osmium)
+# 任意: numba（入っていれば判定カーネルを JIT コンパイル）
+#       numpy（入っていれば長い way の延長計算をベクトル化）
+#       orjson（入っていれば GeoJSON 書き出しを高速化）
 # 入力: japan-latest.osm.pbf（自動検出 or 環境変数 PBF_PATH）
 # 出力: data/out/rindo_master_lines.geojson
 
-import json, glob, math, pathlib, os, sys
+import json, glob, math, pathlib, os, re, sys
 import osmium
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:  # numba 無しでも同じロジックを素の Python で実行
+    _NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 OUT_DIR = ROOT / "data" / "out"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -80,6 +103,16 @@ FORESTRY_POS = (
 # tracktype の陽性（未舗装度）
 TRACK_POS = ("grade3", "grade4", "grade5")
 
+# 上の語群をそれぞれ 1 本の正規表現にまとめ、部分一致判定を 1 回の search で済ませる
+def _any_of(words) -> "re.Pattern[str]":
+    return re.compile("|".join(map(re.escape, words)))
+
+_HARD_NEG_RE  = _any_of(NAME_HARD_NEG)
+_SOFT_NEG_RE  = _any_of(NAME_SOFT_NEG)
+_TRACK_POS_RE = _any_of(TRACK_POS)
+_UNPAVED_RE   = _any_of(UNPAVED_WORDS)
+_PAVED_RE     = _any_of(PAVED_WORDS)
+
 # -------------------------
 # 幾何ツール
 # -------------------------
@@ -89,9 +122,14 @@ def dist_m(a, b) -> float:
     dy = (a[1] - b[1]) * 110540
     return (dx*dx + dy*dy) ** 0.5
 
+# これ未満の点数なら素のループの方が速い（配列化のコストが勝つ）
+NP_MIN_POINTS = 16
+
 def quick_length(coords) -> float:
     if len(coords) < 2:
         return 0.0
+    if np is not None and len(coords) >= NP_MIN_POINTS:
+        return _quick_length_np(coords)
     length_m = 0.0
     for i in range(len(coords) - 1):
         length_m += dist_m(coords[i], coords[i+1])
@@ -100,205 +138,293 @@ def quick_length(coords) -> float:
             break
     return length_m
 
+def _quick_length_np(coords) -> float:
+    """quick_length の numpy 版。MIN_LEN_M を超えた区間までの累積長を返す（早期終了と同じ値）"""
+    arr = np.asarray(coords, dtype=np.float64)
+    lon, lat = arr[:, 0], arr[:, 1]
+    dx = (lon[:-1] - lon[1:]) * 111320 * np.cos(np.radians((lat[:-1] + lat[1:]) / 2))
+    dy = (lat[:-1] - lat[1:]) * 110540
+    cum = np.cumsum(np.sqrt(dx*dx + dy*dy))
+    idx = int(np.searchsorted(cum, MIN_LEN_M))
+    return float(cum[min(idx, len(cum) - 1)])
+
 # -------------------------
 # 判定ロジック
+# タグを (highwayコード, serviceコード, フラグ) の整数に落とし、採否とスコアは
+# 整数演算だけの score_codes で決める（numba があれば JIT）。
+# フラグがそのまま理由のビットマスクを兼ね、理由の文字列は採用した way だけ
+# decode_reasons で組み立てる（棄却時は文字列を一切作らない）。
 # -------------------------
-def score_rindo(tags: dict) -> tuple[bool, int, list[str]]:
+HW_CODE = {"track": 1, "service": 2, "unclassified": 3}
+HW_TRACK, HW_SERVICE, HW_UNCLASSIFIED = 1, 2, 3
+
+SV_OTHER, SV_AGRI, SV_URBAN, SV_FOREST = 0, 1, 2, 3
+SV_CODE = {k: SV_URBAN for k in URBAN_SERVICE}
+SV_CODE.update({"irrigation": SV_AGRI, "drainage": SV_AGRI, "agricultural": SV_AGRI, "forest_service": SV_FOREST})
+
+F_WATERWAY      = 1 << 0
+F_HARD_NEG      = 1 << 1
+F_NAME_RINDO    = 1 << 2
+F_SOFT_NEG      = 1 << 3
+F_TRACK_POS     = 1 << 4
+F_UNPAVED       = 1 << 5
+F_PAVED         = 1 << 6
+F_ACCESS_FOREST = 1 << 7
+F_MV_FOREST     = 1 << 8
+F_FOREST_AREA   = 1 << 9
+
+def encode_tags(tags) -> tuple[int, int, int]:
+    """タグを (highwayコード, serviceコード, フラグ) に変換（tags は dict / osmium の TagList）"""
+    name = tags.get("name") or ""
+    tracktype = (tags.get("tracktype") or "").lower()
+    surface = (tags.get("surface") or "").lower()
+    flags = 0
+    if tags.get("waterway"):
+        flags |= F_WATERWAY
+    if _HARD_NEG_RE.search(name):
+        flags |= F_HARD_NEG
+    if "林道" in name:
+        flags |= F_NAME_RINDO
+    if _SOFT_NEG_RE.search(name):
+        flags |= F_SOFT_NEG
+    if _TRACK_POS_RE.search(tracktype):
+        flags |= F_TRACK_POS
+    if _UNPAVED_RE.search(surface):
+        flags |= F_UNPAVED
+    if _PAVED_RE.search(surface):
+        flags |= F_PAVED
+    if (tags.get("access") or "").lower() == "forestry":
+        flags |= F_ACCESS_FOREST
+    if (tags.get("motor_vehicle") or "").lower() == "forestry":
+        flags |= F_MV_FOREST
+    if (tags.get("landuse") or "").lower() == "forest" or (tags.get("natural") or "").lower() == "wood":
+        flags |= F_FOREST_AREA
+    hw = HW_CODE.get((tags.get("highway") or "").lower(), 0)
+    sv = SV_CODE.get((tags.get("service") or "").lower(), SV_OTHER)
+    return hw, sv, flags
+
+@njit(cache=True)
+def score_codes(hw: int, sv: int, flags: int) -> tuple[bool, int]:
     """
-    返値: (採用/棄却, 合計スコア, 理由の配列)
+    返値: (採用/棄却, 合計スコア)
     ※ 名称に「林道」を含む場合は無条件採用（スコアは計上もするが長さ免除）
     """
-    reasons = []
-    score = 0
-
-    h = (tags.get("highway") or "").lower()
-    if h not in OK_HIGHWAYS:
-        return (False, score, ["highwayが対象外"])
-
-    name = (tags.get("name") or "")
-    tracktype = (tags.get("tracktype") or "").lower()
-    access = (tags.get("access") or "").lower()
-    mv = (tags.get("motor_vehicle") or "").lower()
-    service = (tags.get("service") or "").lower()
-    surface = (tags.get("surface") or "").lower()
-    waterway = (tags.get("waterway") or "").lower()
-    landuse = (tags.get("landuse") or "").lower()
-    natural = (tags.get("natural") or "").lower()
-
+    if hw == 0:
+        return False, 0
     # 即除外（用水/水路/農業系）
-    if waterway:
-        return (False, score, ["waterwayタグで除外"])
-    if any(k in name for k in NAME_HARD_NEG):
-        return (False, score, ["名称に農業/用水系NGワード"])
-
-    if service in {"irrigation", "drainage", "agricultural"}:
-        return (False, score, ["serviceが農業/用水系"])
-
-    # 名称に「林道」→無条件採用（強ポジ）
-    if "林道" in name:
-        score += 10
-        reasons.append("名称=林道")
-        return (True, score, reasons)  # 長さは後段で免除扱い
-
+    if flags & F_WATERWAY or flags & F_HARD_NEG or sv == SV_AGRI:
+        return False, 0
+    # 名称に「林道」→無条件採用（強ポジ）。長さは後段で免除扱い
+    if flags & F_NAME_RINDO:
+        return True, 10
+    score = 0
     # 都市系の service は強い負点
-    if service in URBAN_SERVICE:
+    if sv == SV_URBAN:
         score -= 10
-        reasons.append(f"都市系service={service}")
-
     # track + 未舗装度
-    if h == "track":
-        if any(g in tracktype for g in TRACK_POS):
+    if hw == HW_TRACK:
+        if flags & F_TRACK_POS:
             score += 5
-            reasons.append(f"tracktype={tracktype}")
-        # surface 未舗装
-        if any(w in surface for w in UNPAVED_WORDS):
+        if flags & F_UNPAVED:
             score += 3
-            reasons.append(f"surface(未舗装)={surface}")
-        if any(w in surface for w in PAVED_WORDS):
+        if flags & F_PAVED:
             score -= 2
-            reasons.append(f"surface(舗装)={surface}")
-
     # service/unclassified でも森林系用途があれば加点
-    for k, v in FORESTRY_POS:
-        if (tags.get(k) or "").lower() == v:
-            score += 5
-            reasons.append(f"{k}={v}")
-
+    if sv == SV_FOREST:
+        score += 5
+    if flags & F_ACCESS_FOREST:
+        score += 5
+    if flags & F_MV_FOREST:
+        score += 5
     # 位置のヒント（way 自身に landuse/natural が付くケースは稀だが保険）
-    if landuse == "forest" or natural == "wood":
+    if flags & F_FOREST_AREA:
         score += 3
-        reasons.append("forest/wood上")
-
     # 要注意ワードは小さく減点（“作業道”等）
-    if any(k in name for k in NAME_SOFT_NEG):
+    if flags & F_SOFT_NEG:
         score -= 2
-        reasons.append("名称に要注意ワード")
-
-    # highway 種別の素点
-    if h == "track":
+    # highway 種別の素点（service は neutral）
+    if hw == HW_TRACK:
         score += 2
-        reasons.append("highway=track")
-    elif h == "unclassified":
+    elif hw == HW_UNCLASSIFIED:
         score += 1
+    return score >= SCORE_THRESHOLD, score
+
+def decode_reasons(hw: int, sv: int, flags: int, tags) -> list[str]:
+    """score_codes の判定理由を人が読める文字列に戻す（採用した way に対してだけ呼ぶ）"""
+    if hw == 0:
+        return ["highwayが対象外"]
+    if flags & F_WATERWAY:
+        return ["waterwayタグで除外"]
+    if flags & F_HARD_NEG:
+        return ["名称に農業/用水系NGワード"]
+    if sv == SV_AGRI:
+        return ["serviceが農業/用水系"]
+    if flags & F_NAME_RINDO:
+        return ["名称=林道"]
+    reasons = []
+    if sv == SV_URBAN:
+        reasons.append(f"都市系service={(tags.get('service') or '').lower()}")
+    if hw == HW_TRACK:
+        if flags & F_TRACK_POS:
+            reasons.append(f"tracktype={(tags.get('tracktype') or '').lower()}")
+        if flags & F_UNPAVED:
+            reasons.append(f"surface(未舗装)={(tags.get('surface') or '').lower()}")
+        if flags & F_PAVED:
+            reasons.append(f"surface(舗装)={(tags.get('surface') or '').lower()}")
+    if sv == SV_FOREST:
+        reasons.append("service=forest_service")
+    if flags & F_ACCESS_FOREST:
+        reasons.append("access=forestry")
+    if flags & F_MV_FOREST:
+        reasons.append("motor_vehicle=forestry")
+    if flags & F_FOREST_AREA:
+        reasons.append("forest/wood上")
+    if flags & F_SOFT_NEG:
+        reasons.append("名称に要注意ワード")
+    if hw == HW_TRACK:
+        reasons.append("highway=track")
+    elif hw == HW_UNCLASSIFIED:
         reasons.append("highway=unclassified")
-    elif h == "service":
-        score += 0  # neutral
+    return reasons
+
+def score_rindo(tags) -> tuple[bool, int, list[str]]:
+    """返値: (採用/棄却, 合計スコア, 理由の配列)"""
+    hw, sv, flags = encode_tags(tags)
+    ok, score = score_codes(hw, sv, flags)
+    return ok, score, decode_reasons(hw, sv, flags, tags)
+
+# -------------------------
+# 出力（Feature を 1 件ずつ書き出し、全件をメモリに溜めない）
+# -------------------------
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+class FeatureCollectionWriter:
+    def __init__(self, path: pathlib.Path, n_samples: int = 5):
+        self._fp = open(path, "wb", buffering=1 << 20)
+        self._fp.write(b'{"type":"FeatureCollection","features":[')
+        self.count = 0
+        self.samples = []  # ログ表示用に先頭数件だけ保持
+        self._n_samples = n_samples
+
+    def write(self, feat: dict):
+        if self.count:
+            self._fp.write(b",")
+        self._fp.write(_dumps(feat))
+        self.count += 1
+        if len(self.samples) < self._n_samples:
+            self.samples.append(feat)
+
+    def close(self):
+        if self._fp.closed:
+            return
+        self._fp.write(b"]}")
+        self._fp.close()
+
+    def __enter__(self):
+        return self
 
-    return (score >= SCORE_THRESHOLD, score, reasons)
+    def __exit__(self, *exc):
+        self.close()
 
 # -------------------------
 # ハンドラ
 # -------------------------
+def handle_way(w, tags, out: FeatureCollectionWriter):
+    """1 本の way を判定し、採用なら out へ書き出す（tags は w.tags をそのまま渡す。dict へのコピーはしない）"""
+    hw, sv, flags = encode_tags(tags)
+    ok, score = score_codes(hw, sv, flags)
+    named_rindo = bool(flags & F_NAME_RINDO)
+    if not ok and not named_rindo:
+        return
+
+    coords = [[n.lon, n.lat] for n in w.nodes]
+    if len(coords) < 2:
+        return
+
+    # 名称「林道」以外には長さフィルタ適用（「林道」も長さは記録しておく）
+    length_m = quick_length(coords)
+    if (not named_rindo) and length_m < MIN_LEN_M:
+        return
+
+    out.write({
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": coords},
+        "properties": {
+            "id": int(w.id),
+            "name": tags.get("name") or "林道(名称不明)",
+            "highway": tags.get("highway"),
+            "tracktype": tags.get("tracktype"),
+            "service": tags.get("service"),
+            "surface": tags.get("surface"),
+            "access": tags.get("access"),
+            "motor_vehicle": tags.get("motor_vehicle"),
+            "landuse": tags.get("landuse"),
+            "natural": tags.get("natural"),
+            "len_m_est": round(length_m, 1),
+            "score": score,
+            "reasons": decode_reasons(hw, sv, flags, tags),
+            "source": "OSM"
+        }
+    })
+
+# pyosmium>=4: 読み込み段（C++ 側）で不要な way を落としてから Python に渡す
+def has_tag_filters() -> bool:
+    return hasattr(osmium, "FileProcessor") and hasattr(osmium, "filter")
+
+def run_with_processor(pbf_path: pathlib.Path, out: FeatureCollectionWriter):
+    # 採用され得るのは highway 付き（スコア判定）か name 付き（名称「林道」）だけ。
+    # highway も name も無い way（建物・土地利用の大半）はここで捨てる
+    # ノードは座標キャッシュのために読むだけで、イテレータには way だけを流す
+    fp = (osmium.FileProcessor(str(pbf_path), osmium.osm.NODE | osmium.osm.WAY)
+          .with_locations()
+          .with_filter(osmium.filter.EntityFilter(osmium.osm.WAY))
+          .with_filter(osmium.filter.KeyFilter("highway", "name")))
+    for w in fp:
+        handle_way(w, w.tags, out)
+
 class RindoHandler(osmium.SimpleHandler):
-    def __init__(self):
+    def __init__(self, out: FeatureCollectionWriter):
         super().__init__()
-        self.features = []
+        self.out = out
 
     def way(self, w: "osmium.osm.Way"):
-        tags = dict(w.tags)
-        ok, score, reasons = score_rindo(tags)
-        if not ok and "林道" not in (tags.get("name") or ""):
-            return
-
-        coords = [[n.lon, n.lat] for n in w.nodes]
-        if len(coords) < 2:
-            return
-
-        # 名称「林道」以外には長さフィルタ適用
-        named_rindo = ("林道" in (tags.get("name") or ""))
-        if not named_rindo:
-            length_m = quick_length(coords)
-            if length_m < MIN_LEN_M:
-                return
-        else:
-            length_m = quick_length(coords)  # 記録はしておく
-
-        self.features.append({
-            "type": "Feature",
-            "geometry": {"type": "LineString", "coordinates": coords},
-            "properties": {
-                "id": int(w.id),
-                "name": tags.get("name") or "林道(名称不明)",
-                "highway": tags.get("highway"),
-                "tracktype": tags.get("tracktype"),
-                "service": tags.get("service"),
-                "surface": tags.get("surface"),
-                "access": tags.get("access"),
-                "motor_vehicle": tags.get("motor_vehicle"),
-                "landuse": tags.get("landuse"),
-                "natural": tags.get("natural"),
-                "len_m_est": round(length_m, 1),
-                "score": score,
-                "reasons": reasons,
-                "source": "OSM"
-            }
-        })
+        handle_way(w, w.tags, self.out)
 
 # SimpleHandler が動かない環境向けフォールバック
-def run_with_reader(pbf_path: pathlib.Path):
-    feats = []
+def run_with_reader(pbf_path: pathlib.Path, out: FeatureCollectionWriter):
     rd = osmium.io.Reader(str(pbf_path))
     for obj in rd:
         if not isinstance(obj, osmium.osm.Way):
             continue
-        tags = {t.k: t.v for t in obj.tags}
-        ok, score, reasons = score_rindo(tags)
-        if not ok and "林道" not in (tags.get("name") or ""):
-            continue
-        coords = [[n.lon, n.lat] for n in obj.nodes]
-        if len(coords) < 2:
-            continue
-        named_rindo = ("林道" in (tags.get("name") or ""))
-        length_m = quick_length(coords)
-        if (not named_rindo) and length_m < MIN_LEN_M:
-            continue
-        feats.append({
-            "type": "Feature",
-            "geometry": {"type": "LineString", "coordinates": coords},
-            "properties": {
-                "id": int(obj.id),
-                "name": tags.get("name") or "林道(名称不明)",
-                "highway": tags.get("highway"),
-                "tracktype": tags.get("tracktype"),
-                "service": tags.get("service"),
-                "surface": tags.get("surface"),
-                "access": tags.get("access"),
-                "motor_vehicle": tags.get("motor_vehicle"),
-                "landuse": tags.get("landuse"),
-                "natural": tags.get("natural"),
-                "len_m_est": round(length_m, 1),
-                "score": score,
-                "reasons": reasons,
-                "source": "OSM"
-            }
-        })
+        handle_way(obj, obj.tags, out)
     rd.close()
-    return feats
 
 # -------------------------
 # メイン
 # -------------------------
 def main():
     print(f"[INFO] Reading PBF: {PBF_PATH}")
-    print(f"[INFO] MIN_LEN_M={MIN_LEN_M}, SCORE_THRESHOLD={SCORE_THRESHOLD}")
+    print(f"[INFO] MIN_LEN_M={MIN_LEN_M}, SCORE_THRESHOLD={SCORE_THRESHOLD}, numba={_NUMBA_AVAILABLE}")
 
     try:
-        h = RindoHandler()
-        h.apply_file(str(PBF_PATH), locations=True)
-        feats = h.features
+        with FeatureCollectionWriter(GEOJSON_OUT) as out:
+            if has_tag_filters():
+                run_with_processor(PBF_PATH, out)
+            else:
+                h = RindoHandler(out)
+                h.apply_file(str(PBF_PATH), locations=True)
     except TypeError:
         print("[WARN] SimpleHandler failed. Falling back to Reader loop.")
-        feats = run_with_reader(PBF_PATH)
-
-    GEOJSON_OUT.write_text(
-        json.dumps({"type": "FeatureCollection", "features": feats}, ensure_ascii=False),
-        encoding="utf-8"
-    )
-    print(f"[OK] {len(feats)} features → {GEOJSON_OUT}")
-    if feats:
-        # 参考: サンプル理由を数件表示
-        for f in feats[:5]:
-            print("[SAMPLE]", f["properties"]["name"], f["properties"]["score"], f["properties"]["reasons"])
+        with FeatureCollectionWriter(GEOJSON_OUT) as out:  # 途中まで書いた分は作り直す
+            run_with_reader(PBF_PATH, out)
+
+    print(f"[OK] {out.count} features → {GEOJSON_OUT}")
+    # 参考: サンプル理由を数件表示
+    for f in out.samples:
+        print("[SAMPLE]", f["properties"]["name"], f["properties"]["score"], f["properties"]["reasons"])
 
 if __name__ == "__main__":
     main()
@@ -1,41 +1,77 @@
 # scripts/check_yamanashi_match.py
-import json, unicodedata, re, pathlib
+import json, mmap, unicodedata, re, pathlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 roads = ROOT / "data" / "out" / "roads.geojson"
 reg   = ROOT / "data" / "out" / "yamanashi_registry.json"
 
+# norm_name 用の正規表現（毎回コンパイルしない）
+# 段の順序は元の置換と同じにする（括弧内を消して隣り合った語がノイズ語になる場合なども同じ結果に）
+_BRACKETS_PAT = re.compile(r"[【［\[\{〔].*?[】］\]\}〕]")
+_PAREN_PAT    = re.compile(r"[（(].*?[)）]")
+_OWNER_PAT    = re.compile(r"県営|市営|町営|村営")
+_TAIL_MAIN_PAT = re.compile(r"(?:本線|幹線)$")
+_TAIL_SUB_PAT  = re.compile(r"支線?$")
+_STRIP_PAT    = re.compile(r"林道|[線（）()・･‐\-—―ｰ－–\s　]")
+
 def norm_name(s: str) -> str:
     if not s: return ""
     s = unicodedata.normalize("NFKC", s)
     # 【カナ】/［ ］/〔 〕/[] の括弧内を除去
-    s = re.sub(r"[【［\[\{〔].*?[】］\]\}〕]", "", s)
+    s = _BRACKETS_PAT.sub("", s)
     # () の括弧内も除去
-    s = re.sub(r"[（(].*?[)）]", "", s)
-    # 長音等の統一
-    s = s.replace("－","-").replace("―","-").replace("–","-")
+    s = _PAREN_PAT.sub("", s)
     # ヶ/ヵ の表記差を吸収
     s = s.replace("ヶ","ケ").replace("ヵ","カ")
     # よくある接尾語・ノイズ
-    s = re.sub(r"(森林管理道)", "", s)
-    s = re.sub(r"(県営|市営|町営|村営)", "", s)
-    s = re.sub(r"(本線|幹線)$", "", s)
-    s = re.sub(r"(支線?)$", "", s)  # “支”だけも落とす
-    s = s.replace("林道","").replace("線","")
-    # 残りの記号・空白
-    s = re.sub(r"[（）()・･‐\-—―ｰ\s　]", "", s)
+    s = s.replace("森林管理道", "")
+    s = _OWNER_PAT.sub("", s)
+    s = _TAIL_MAIN_PAT.sub("", s)
+    s = _TAIL_SUB_PAT.sub("", s)  # “支”だけも落とす
+    # 林道/線と残りの記号・空白（長音等もここで落ちる）
+    s = _STRIP_PAT.sub("", s)
     return s
 
+# make_roads_from_master.py の load_json と同じ中身（各スクリプトは単体で動かすので複製。直すときは揃えて）
+def load_json(path):
+    """JSON を bytes のまま読む（orjson があれば mmap 上を直接解析。BOM 付きでも可）"""
+    with open(path, "rb") as f:
+        if orjson is None:
+            return json.loads(f.read())   # bytes なら BOM 判定も json 側がやる
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            return orjson.loads(mv[3:] if mv[:3] == b"\xef\xbb\xbf" else mv)
+
+# export_popup_names.py / check_yamanashi_match.py で同じ中身の複製（各スクリプトは単体で動かすので。直すときは揃えて）
+def iter_properties(path):
+    """features[].properties だけを順に返す（ijson があればジオメトリを Python オブジェクト化せず、ファイル全体も読み込まない）"""
+    if ijson is None:
+        for ft in load_json(path).get("features", []):
+            yield ft.get("properties") or {}
+        return
+    with open(path, "rb") as f:
+        if f.read(3) != b"\xef\xbb\xbf":  # BOM 付きは load_json と同じく読み飛ばす
+            f.seek(0)
+        for prop in ijson.items(f, "features.item.properties", use_float=True):
+            yield prop or {}
+
 # ---- データ読込
-r = json.loads(roads.read_text(encoding="utf-8"))
-g = json.loads(reg.read_text(encoding="utf-8"))
+g = load_json(reg)
 yn_dict = g.get("by_norm") or {}
 yn_keys = set(yn_dict.keys())
 
 # 山梨(19)の線を正規化名で集計
 osm_norms = {}
-for f in r.get("features", []):
-    p = f.get("properties") or {}
+for p in iter_properties(roads):
     if str(p.get("pref_code")) != "19":
         continue
     raw = p.get("name") or p.get("rindo_name") or p.get("display_name") or ""
@@ -5,88 +5,159 @@ roads.geojson からポップアップ表示用の林道名をユニーク抽出
 出力: data/derived/rindo_names.csv / .json
 """
 
-import json, os, csv, re
-from collections import defaultdict
+import json, mmap, os, csv, re
+from dataclasses import dataclass
+from functools import lru_cache
 from urllib.parse import urlparse
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 IN1 = "view/data/out/roads.geojson"
 IN2 = "data/out/roads.geojson"
 OUT_DIR = "data/derived"
 os.makedirs(OUT_DIR, exist_ok=True)
 
+_SPACE_PAT = re.compile(r"[　\s]")
+# 末尾の「線」と括弧や横棒類を1パスで（末尾判定は記号除去前の文字列で行う）
+_TAIL_SEP_PAT = re.compile(r"(?:線|せん)$|[（）\(\)･・‐-—―\-ｰ]")
+
 def normalize_name(s: str) -> str:
     if not s: return ""
     t = s.strip()
     # よくある接尾辞や表記ゆれを軽く正規化
-    t = re.sub(r"[　\s]", "", t)            # 全角/半角スペース除去
-    t = re.sub(r"林道", "", t)               # 「林道」を一旦外す
-    t = re.sub(r"(線|せん)$", "", t)        # 末尾の「線」を外す
-    t = re.sub(r"[（）\(\)･・‐-—―\-ｰ]", "", t)  # 括弧や横棒類
+    t = _SPACE_PAT.sub("", t)        # 全角/半角スペース除去
+    t = t.replace("林道", "")         # 「林道」を一旦外す
+    t = _TAIL_SEP_PAT.sub("", t)     # 末尾の「線」、括弧や横棒類
     return t
 
-def host_of(u: str) -> str:
+# "scheme://netloc/..." の netloc 部分（urlparse(u).netloc と同じ範囲）
+_HOST_RE = re.compile(r"^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//([^/?#]*)")
+# urlparse が前処理で変える入力（先頭の空白・制御文字の除去、途中の \t\r\n の除去、[IPv6] の検査）
+_HOST_ODD = re.compile(r"^[\x00-\x20]|[\t\r\n\[\]]")
+
+def _host_urlparse(u) -> str:
     try:
         return urlparse(u).netloc.lower()
     except Exception:
         return ""
 
+@lru_cache(maxsize=16384)  # 同じ source_url を持つ区間が多いのでほぼキャッシュで返る
+def _host_of_str(u: str) -> str:
+    if _HOST_ODD.search(u):
+        return _host_urlparse(u)
+    m = _HOST_RE.match(u)
+    if not m:
+        return ""
+    host = m.group(1)
+    if not host.isascii():  # 非 ASCII の netloc は urlparse が NFKC で検査する
+        return _host_urlparse(u)
+    return host.lower()
+
+def host_of(u) -> str:
+    """urlparse(u).netloc.lower() と同じ（解析できなければ ""）。普通の URL は正規表現で"""
+    if not isinstance(u, str):
+        return _host_urlparse(u)
+    return _host_of_str(u)
+
+# make_roads_from_master.py の load_json と同じ中身（各スクリプトは単体で動かすので複製。直すときは揃えて）
+def load_json(path):
+    """JSON を bytes のまま読む（orjson があれば mmap 上を直接解析。BOM 付きでも可）"""
+    with open(path, "rb") as f:
+        if orjson is None:
+            return json.loads(f.read())   # bytes なら BOM 判定も json 側がやる
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            return orjson.loads(mv[3:] if mv[:3] == b"\xef\xbb\xbf" else mv)
+
+# export_popup_names.py / check_yamanashi_match.py で同じ中身の複製（各スクリプトは単体で動かすので。直すときは揃えて）
+def iter_properties(path):
+    """features[].properties だけを順に返す（ijson があればジオメトリを Python オブジェクト化せず、ファイル全体も読み込まない）"""
+    if ijson is None:
+        for ft in load_json(path).get("features", []):
+            yield ft.get("properties") or {}
+        return
+    with open(path, "rb") as f:
+        if f.read(3) != b"\xef\xbb\xbf":  # BOM 付きは load_json と同じく読み飛ばす
+            f.seek(0)
+        for prop in ijson.items(f, "features.item.properties", use_float=True):
+            yield prop or {}
+
 path = IN1 if os.path.exists(IN1) else IN2
-with open(path, "r", encoding="utf-8") as f:
-    gj = json.load(f)
-
-bucket = defaultdict(lambda: {
-    "name_originals": set(),
-    "norm_name": "",
-    "prefs": set(),
-    "domains": set(),
-    "segments": 0,
-    "events": 0,
-})
-
-for ft in gj.get("features", []):
-    prop = ft.get("properties", {}) or {}
+
+@dataclass(slots=True)
+class Bucket:
+    """正規化名ごとの集計。prefs/domains は値が出てきたときに初めて set を作る"""
+    name_originals: set
+    norm_name: str = ""
+    prefs: set | None = None
+    domains: set | None = None
+    segments: int = 0
+    events: int = 0
+
+bucket: dict[str, Bucket] = {}
+
+for prop in iter_properties(path):
     name = prop.get("name") or prop.get("rindo_name") or ""
     if not name: 
         continue
     norm = normalize_name(name)
     key  = norm or name
-    b = bucket[key]
-    b["name_originals"].add(name)
-    b["norm_name"] = norm or name
+    b = bucket.get(key)
+    if b is None:
+        b = bucket[key] = Bucket(name_originals=set())
+    b.name_originals.add(name)
+    b.norm_name = norm or name
     if prop.get("pref"):
-        b["prefs"].add(prop["pref"])
+        if b.prefs is None:
+            b.prefs = set()
+        b.prefs.add(prop["pref"])
     if prop.get("source_url"):
-        b["domains"].add(host_of(prop["source_url"]))
-    b["segments"] += 1
+        if b.domains is None:
+            b.domains = set()
+        b.domains.add(host_of(prop["source_url"]))
+    b.segments += 1
     # event が紐付く＝規制情報があるとみなす
     if prop.get("status") or prop.get("event_id"):
-        b["events"] += 1
+        b.events += 1
 
-rows = []
-for k, v in bucket.items():
-    rows.append({
-        "norm_name": v["norm_name"],
-        "name_examples": " / ".join(sorted(v["name_originals"]))[:200],
-        "n_segments": v["segments"],
-        "n_events": v["events"],
-        "prefs": ",".join(sorted(v["prefs"])) if v["prefs"] else "",
-        "domains": ",".join(sorted(v["domains"])) if v["domains"] else "",
-    })
+FIELDS = ("norm_name", "name_examples", "n_segments", "n_events", "prefs", "domains")
 
-rows.sort(key=lambda r: (-r["n_events"], -r["n_segments"], r["norm_name"]))
+# 並べ替えは bucket の段階で 1 回だけ行い、行はタプルで作る
+rows = [
+    (
+        v.norm_name,
+        " / ".join(sorted(v.name_originals))[:200],
+        v.segments,
+        v.events,
+        ",".join(sorted(v.prefs)) if v.prefs else "",
+        ",".join(sorted(v.domains)) if v.domains else "",
+    )
+    for v in sorted(bucket.values(), key=lambda b: (-b.events, -b.segments, b.norm_name))
+]
 
 # CSV
 csv_path = os.path.join(OUT_DIR, "rindo_names.csv")
 with open(csv_path, "w", newline="", encoding="utf-8") as f:
-    w = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else 
-        ["norm_name","name_examples","n_segments","n_events","prefs","domains"])
-    w.writeheader()
-    for r in rows: w.writerow(r)
+    w = csv.writer(f)
+    w.writerow(FIELDS)
+    w.writerows(rows)
 
 # JSON
 json_path = os.path.join(OUT_DIR, "rindo_names.json")
-with open(json_path, "w", encoding="utf-8") as f:
-    json.dump(rows, f, ensure_ascii=False, indent=2)
+rows = [dict(zip(FIELDS, r)) for r in rows]
+if orjson is not None:
+    with open(json_path, "wb") as f:
+        f.write(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
+else:
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
 
 print("wrote:", csv_path)
 print("wrote:", json_path)
@@ -1,12 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import collections
+import concurrent.futures
+import itertools
 import json
+import mmap
 import pathlib
 import re
+import sys
 import unicodedata
 import os
 import html
+import functools
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # rindo-core/scripts/ 配下にある前提
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -26,36 +43,79 @@ PREF_NAME2CODE = {
     "熊本県":"43","大分県":"44","宮崎県":"45","鹿児島県":"46","沖縄県":"47",
 }
 
+# check_yamanashi_match.py / export_popup_names.py にも同じ中身の複製がある（直すときは揃えて）
+def load_json(path: pathlib.Path):
+    """JSON を bytes のまま読む（orjson があれば mmap 上を直接解析。BOM 付きでも可）"""
+    with open(path, "rb") as f:
+        if orjson is None:
+            return json.loads(f.read())   # bytes なら BOM 判定も json 側がやる
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            return orjson.loads(mv[3:] if mv[:3] == b"\xef\xbb\xbf" else mv)
+
+def iter_features(path: pathlib.Path):
+    """features[] を 1 件ずつ返す（ijson があればマスター全体をメモリに載せない）"""
+    if ijson is None:
+        yield from load_json(path).get("features", [])
+        return
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "features.item", use_float=True)
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)   # 既定で非 ASCII はそのまま・区切りは詰める
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# 括弧内 → 森林管理道 → 県営等 → 末尾の本線/幹線 → 末尾の支線 → 林道/線/記号 の順（元の置換と同じ順）
+# （括弧内を消すとノイズ語や末尾語がつながることがあるので、段は 1 本にまとめない）
+_RE_BRACKETS = re.compile(r"[【［\[\{〔].*?[】］\]\}〕]")     # 【フリガナ】等
+_RE_PAREN = re.compile(r"[（(].*?[)）]")
+_RE_OWNER = re.compile(r"県営|市営|町営|村営")
+_RE_TAIL_MAIN = re.compile(r"(?:本線|幹線)$")
+_RE_TAIL_SUB = re.compile(r"支線?$")                             # “支”も落とす
+_RE_STRIP = re.compile(r"林道|[線（）()・･‐\-—―ｰ－–\s　]")
+_TRANS = str.maketrans({"ヶ": "ケ", "ヵ": "カ"})          # ヶ/ヵ を正規化
+
+@functools.lru_cache(maxsize=65536)  # 同じ林道名がイベント/マスターに何度も出てくる
 def norm_name(s: str) -> str:
     if not s:
         return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = html.unescape(s)
-    s = re.sub(r"[【［\[\{〔].*?[】］\]\}〕]", "", s)      # 【フリガナ】等を除去
-    s = re.sub(r"[（(].*?[)）]", "", s)
-    s = s.replace("－", "-").replace("―", "-").replace("–", "-")
-    s = s.replace("ヶ", "ケ").replace("ヵ", "カ")          # ヶ/ヵ を正規化
-    s = re.sub(r"(森林管理道)", "", s)
-    s = re.sub(r"(県営|市営|町営|村営)", "", s)
-    s = re.sub(r"(本線|幹線)$", "", s)
-    s = re.sub(r"(支線?)$", "", s)                        # “支”も落とす
-    s = s.replace("林道", "").replace("線", "")
-    s = re.sub(r"[（）()・･‐\-—―ｰ\s　]", "", s)
+    if not s.isascii():   # ASCII だけなら NFKC しても変わらない
+        s = unicodedata.normalize("NFKC", s)
+    if "&" in s:          # 実体参照が無ければ html.unescape を呼ばない
+        s = html.unescape(s)
+    s = s.translate(_TRANS)
+    s = _RE_BRACKETS.sub("", s)
+    s = _RE_PAREN.sub("", s)
+    s = s.replace("森林管理道", "")
+    s = _RE_OWNER.sub("", s)
+    s = _RE_TAIL_MAIN.sub("", s)
+    s = _RE_TAIL_SUB.sub("", s)
+    s = _RE_STRIP.sub("", s)
     return s
 
+# 状態語を 1 回の走査で拾い、元の判定順（英語 closed > regulated > open > 日本語 通行止 > 規制系）で
+# 一番強いものを採る。「片側交互通行」は「交互」で、「reopen」は「open」で拾える
+# （長い語を入れると「片側交互通行止」の「通行止」を食ってしまう）。解除/通行可/復旧は既定の open と同じなので入れない
+_RE_STATUS = re.compile(r"closed|regulated|restriction|traffic control|open|通行止|規制|交互|う回|一部")
+_STATUS_RANK = {
+    "closed": 0,
+    "regulated": 1, "restriction": 1, "traffic control": 1,
+    "open": 2,
+    "通行止": 3,
+    "規制": 4, "交互": 4, "う回": 4, "一部": 4,
+}
+_RANK_CODE = ("closed", "regulated", "open", "closed", "regulated")
+
 def status_code(jp_or_en: str) -> str:
     """日本語/英語の状態文字列から open / regulated / closed"""
     if not jp_or_en:
         return "open"
-    t = str(jp_or_en)
-    tl = t.lower()
-    if "closed" in tl: return "closed"
-    if "regulated" in tl or "restriction" in tl or "traffic control" in tl: return "regulated"
-    if "open" in tl or "reopen" in tl: return "open"
-    if "通行止" in t: return "closed"
-    if any(k in t for k in ["規制", "片側交互通行", "交互", "う回", "一部"]): return "regulated"
-    if any(k in t for k in ["解除", "通行可", "復旧"]): return "open"
-    return "open"
+    rank = 5
+    for k in _RE_STATUS.findall(str(jp_or_en).lower()):
+        r = _STATUS_RANK[k]
+        if r < rank:
+            rank = r
+    return _RANK_CODE[rank] if rank < 5 else "open"
 
 SEV = {"open": 1, "regulated": 2, "closed": 3}
 
@@ -65,14 +125,16 @@ def load_events(path: pathlib.Path):
       best: 最強(=closed>regulated>open) 代表 1件
       all_by_key: そのキー配下の全件
       by_name: norm_name 単独の索引（県コード不明時の保険）
+      by_name_pref: norm_name → {pref_code: [代表]}（名前一致時に県で引き直す用）
+      best_by_name: norm_name ごとの最強代表（県を問わない）
     を返す。
     """
-    data = json.loads(path.read_text(encoding="utf-8-sig")) if path.exists() else {"events": []}
-    best, all_by_key, by_name = {}, {}, {}
+    data = load_json(path) if path.exists() else {"events": []}
+    best, all_by_key, by_name, by_name_pref = {}, {}, {}, {}
 
     for e in data.get("events", []):
         nm = norm_name(e.get("norm_name") or e.get("name") or "")
-        pc = str(e.get("pref_code") or "").zfill(2)
+        pc = _ev_pc(e.get("pref_code"))
         if not nm or not pc:
             continue
 
@@ -85,30 +147,62 @@ def load_events(path: pathlib.Path):
             "source_url": e.get("source_url") or "",
             "updated_at": e.get("updated_at") or "",
         }
-        key = f"{pc}|{nm}"
+        key = (pc, nm)
 
         all_by_key.setdefault(key, []).append(cand)
 
+        # (深刻度, 更新日時) のタプル比較 1 回で代表を決める（同順位は先着）
+        rank = (SEV[code], cand["updated_at"])
         cur = best.get(key)
-        if (cur is None) or (SEV[cand["status"]] > SEV[cur["status"]]) \
-           or (SEV[cand["status"]] == SEV[cur["status"]] and cand["updated_at"] > cur["updated_at"]):
-            best[key] = cand
+        if cur is None or rank > cur[0]:
+            best[key] = (rank, cand)
 
+    best = {k: v[1] for k, v in best.items()}
     for v in best.values():
         by_name.setdefault(v["norm_name"], []).append(v)
+        by_name_pref.setdefault(v["norm_name"], {}).setdefault(v["pref_code"], []).append(v)
 
-    return best, by_name, all_by_key
+    best_by_name = {
+        nm: max(cands, key=lambda c: (SEV[c["status"]], c["updated_at"]))
+        for nm, cands in by_name.items()
+    }
+
+    return best, by_name, all_by_key, by_name_pref, best_by_name
+
+_PC_CACHE = {}
+
+def _pc2(x) -> str:
+    """県コードを 2 桁の文字列に（欠落/不正は ""）。値の種類は 47 県分しかないので結果を使い回す"""
+    s = "" if x is None else str(x)
+    v = _PC_CACHE.get(s)
+    if v is None:
+        t = s.strip()
+        if t.lower() in ("", "0", "00", "none", "null"):
+            v = ""
+        else:
+            try:
+                v = sys.intern(f"{int(t):02d}")   # PREF_NAME2CODE の値と同じオブジェクトを共有
+            except Exception:
+                v = ""
+        _PC_CACHE[s] = v
+    return v
+
+_EV_PC_CACHE = {}
+
+def _ev_pc(x) -> str:
+    """
+    イベント側の県コード（従来どおりの zfill(2)）。_pc2 と違い欠落は "" にせず "00" のまま残し、
+    名前だけ一致のフォールバックに使えるようにしておく
+    """
+    s = str(x or "")
+    v = _EV_PC_CACHE.get(s)
+    if v is None:
+        v = _EV_PC_CACHE[s] = sys.intern(s.zfill(2))
+    return v
 
 def _normalize_pref_code(pc_raw, pref_name: str, nm: str, by_name: dict) -> str:
     """マスターの pref_code が欠落/不正なときの正規化＋フォールバック。"""
-    pc = ("" if pc_raw is None else str(pc_raw)).strip()
-    if pc.lower() in ("", "0", "00", "none", "null"):
-        pc = ""
-    else:
-        try:
-            pc = f"{int(pc):02d}"
-        except Exception:
-            pc = ""
+    pc = _pc2(pc_raw)
 
     if not pc and pref_name:
         pc = PREF_NAME2CODE.get(pref_name, "") or ""
@@ -138,155 +232,208 @@ def load_yamanashi_registry(path: pathlib.Path = YN_REG):
     if not path.exists():
         return {}
     try:
-        obj = json.loads(path.read_text(encoding="utf-8"))
+        obj = load_json(path)
         return obj.get("by_norm") or {}
     except Exception:
         return {}
 
+YN_NOTE = "pref.yamanashi list.php registry match by normalized name"
+REG_KEYS = ("reg_from", "reg_to", "reg_reason", "updated_at")   # 県サイト由来の補助属性
+
+def build_yamanashi_index(yn_registry: dict) -> dict:
+    """
+    norm名 → (official, url, status, 補助属性) を先に 1 回だけ作る。
+    official は先頭行の名前があればそのまま全 Feature で共有し、無ければ None（マスター名で補う）。
+    status は closed > regulated > open の優先（同順位は先の行）。
+    """
+    idx = {}
+    for nm, rows in yn_registry.items():
+        if not rows:
+            continue
+        y0 = rows[0]
+        url = y0.get("url") or ""
+        official = None
+        if y0.get("name"):
+            official = {"yamanashi": {"name": y0["name"], "url": url, "note": YN_NOTE}}
+        yn_status = None
+        yn_best = None
+        for r in rows:
+            s = (r.get("status") or "").lower()
+            if not s: continue
+            if (yn_status is None) or (SEV.get(s,1) > SEV.get(yn_status,1)):
+                yn_status = s
+                yn_best = r
+        extra = ()
+        if yn_best:
+            extra = tuple((k, yn_best[k]) for k in REG_KEYS if yn_best.get(k))
+        idx[nm] = (official, url, yn_status, extra)
+    return idx
+
+def convert_feature(f: dict, idx: tuple) -> dict:
+    """マスターの Feature 1 件に規制状態・公式リンクを付けて roads 用にする"""
+    ev_best, ev_by_name, ev_all, ev_by_name_pref, ev_best_by_name, yn_index = idx
+    p = f.get("properties", {}) or {}
+    raw_name = p.get("name") or p.get("rindo_name") or p.get("display_name") or ""
+    nm = norm_name(raw_name)
+
+    pc_raw = p.get("pref_code")
+    pref_name = p.get("pref_name") or p.get("pref") or ""
+    pc = _normalize_pref_code(pc_raw, pref_name, nm, ev_by_name)
+
+    # まず (pref_code, norm_name) でイベント候補を取得（キーで県は一致済みなので再チェックしない）
+    key = (pc, nm) if (pc and nm) else None
+    events = ev_all.get(key, []) if key else []
+
+    # 代表 status 判定用の集計（status は load_events で status_code 済み）
+    reg_cnt = 0
+    cls_cnt = 0
+
+    for e in events:
+        c = e["status"]
+        if c == "closed":
+            cls_cnt += 1
+        elif c == "regulated":
+            reg_cnt += 1
+
+    # フォールバック：名前だけ一致（県コード無視）
+    if reg_cnt == 0 and cls_cnt == 0 and nm:
+        fb = ev_by_name.get(nm, []) or []
+        fb_reg = fb_cls = 0
+        for e in fb:
+            c = e["status"]
+            if c == "closed":
+                fb_cls += 1
+            elif c == "regulated":
+                fb_reg += 1
+        if fb_cls > 0 or fb_reg > 0:
+            reg_cnt, cls_cnt = fb_reg, fb_cls
+            events = fb
+            # 県コード未確定なら、山梨(19)が含まれていれば固定
+            if not pc and "19" in ev_by_name_pref.get(nm, {}):
+                pc = "19"
+                key = (pc, nm)
+
+    # 代表（最悪＝closed > regulated > open）
+    rep = ev_best.get(key) if key else None
+    if (not rep) and nm:
+        rep = ev_best_by_name.get(nm)
+
+    # 最終 status（ベース：既存イベント）
+    st = "closed" if cls_cnt > 0 else ("regulated" if reg_cnt > 0 else "open")
+
+    # --- ★山梨 公式リンク＋規制情報（kisei.php?id=…）の付与／上書き ---
+    official = {}
+    yn = yn_index.get(nm)
+    if yn:
+        # URL は必ず付与（先頭を採用）
+        official, y_url, yn_status, yn_extra = yn
+        if official is None:   # レジストリ側に名前が無いときだけマスターの名前で作る
+            official = {"yamanashi": {"name": raw_name, "url": y_url, "note": YN_NOTE}}
+        if yn_status:
+            st = yn_status  # ★県サイトで上書き
+            # 補助属性も書き込む
+            for k, v in yn_extra:
+                p[k] = v
+
+    # properties 構築
+    props = {
+        "id": p.get("id"),
+        "name": raw_name,
+        "norm_name": nm,
+        "pref_code": pc,
+        "pref_name": pref_name,
+        "highway": p.get("highway"),
+        "tracktype": p.get("tracktype"),
+        "access": p.get("access"),
+        "motor_vehicle": p.get("motor_vehicle"),
+        "service": p.get("service"),
+        "surface": p.get("surface"),
+        "status": st,                # ← 色分けはここを見る（closed/regulated/open）
+        "regulated": reg_cnt,
+        "closed": cls_cnt,
+        "status_jp": (rep.get("status_jp") if rep else "") or "",
+        "source_url": (rep.get("source_url") if rep else "") or "",
+        "source": "OSM",
+    }
+    if official:
+        props["official"] = official  # ← map.html でリンク表示に利用
+
+    # 県サイトから補助属性を付けていたら反映（上で p[...] に入れている）
+    for k in REG_KEYS:
+        v = p.get(k)
+        if v: props[k] = v
+
+    # Feature 自体は作り直さず properties だけ差し替える
+    # （マスター側の score/reasons/len_m_est 等は roads には載せないので p の使い回しはしない）
+    f["properties"] = props
+    return f
+
+# ---- 並列処理（索引はワーカーごとに 1 回だけ受け取り、結果は JSON の bytes で返す）
+BATCH = 2048
+
+_IDX = None
+
+def _init_worker(idx):
+    global _IDX
+    _IDX = idx
+
+def _convert_batch(batch: list) -> bytes:
+    return b",".join(_dumps(convert_feature(f, _IDX)) for f in batch)
+
+def _batches(it, n: int):
+    it = iter(it)
+    while True:
+        batch = list(itertools.islice(it, n))
+        if not batch:
+            return
+        yield batch
+
 def main():
-    master = json.loads(IN_MASTER.read_text(encoding="utf-8"))
-    ev_best, ev_by_name, ev_all = load_events(IN_EVENTS)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Feature 変換の並列プロセス数（1 で逐次）")
+    args = ap.parse_args()
+
+    ev_best, ev_by_name, ev_all, ev_by_name_pref, ev_best_by_name = load_events(IN_EVENTS)
     yn_registry = load_yamanashi_registry()  # ★山梨公式リンク+規制情報（norm名→配列）
+    yn_index = build_yamanashi_index(yn_registry)
+    idx = (ev_best, ev_by_name, ev_all, ev_by_name_pref, ev_best_by_name, yn_index)
 
-    feats_out = []
+    n_out = 0
     matched = 0
 
-    for f in master.get("features", []):
-        p = f.get("properties", {}) or {}
-        raw_name = p.get("name") or p.get("rindo_name") or p.get("display_name") or ""
-        nm = norm_name(raw_name)
-
-        pc_raw = p.get("pref_code")
-        pref_name = p.get("pref_name") or p.get("pref") or ""
-        pc = _normalize_pref_code(pc_raw, pref_name, nm, ev_by_name)
-
-        # まず (pref_code|norm_name) でイベント候補を取得
-        key = f"{pc}|{nm}" if (pc and nm) else None
-        events = ev_all.get(key, []) if key else []
-
-        # 代表 status 判定用の集計
-        reg_cnt = 0
-        cls_cnt = 0
-
-        def _is_closed(v: str) -> bool:
-            if not v: return False
-            t = str(v).lower()
-            return ("closed" in t) or ("通行止" in v)
-
-        def _is_reg(v: str) -> bool:
-            if not v: return False
-            t = str(v).lower()
-            if ("regulated" in t) or ("restriction" in t):
-                return True
-            if any(k in v for k in ("規制","片側","交互","徐行","重量","幅員","速度","チェーン","一部")):
-                return True
-            return False
-
-        for e in events:
-            if pc and str(e.get("pref_code")) != str(pc):
-                continue
-            st_e = e.get("status") or e.get("status_jp") or ""
-            if _is_closed(st_e):
-                cls_cnt += 1
-            elif _is_reg(st_e):
-                reg_cnt += 1
-
-        # フォールバック：名前だけ一致（県コード無視）
-        if reg_cnt == 0 and cls_cnt == 0 and nm:
-            fb = ev_by_name.get(nm, []) or []
-            fb_reg = fb_cls = 0
-            for e in fb:
-                st_e = e.get("status") or e.get("status_jp") or ""
-                if _is_closed(st_e):
-                    fb_cls += 1
-                elif _is_reg(st_e):
-                    fb_reg += 1
-            if fb_cls > 0 or fb_reg > 0:
-                reg_cnt, cls_cnt = fb_reg, fb_cls
-                events = fb
-                # 県コード未確定なら、山梨(19)が含まれていれば固定
-                if not pc and any(e.get("pref_code") == "19" for e in fb):
-                    pc = "19"
-                    key = f"{pc}|{nm}"
-
-        # 代表（最悪＝closed > regulated > open）
-        rep = ev_best.get(key) if key else None
-        if (not rep) and nm:
-            for cand in ev_by_name.get(nm, []) or []:
-                if (not rep) or (SEV[(cand.get("status") or "open")] > SEV[(rep.get("status") or "open")]) \
-                   or (SEV[(cand.get("status") or "open")] == SEV[(rep.get("status") or "open")] and (cand.get("updated_at") or "") > (rep.get("updated_at") or "")):
-                    rep = cand
-
-        # 最終 status（ベース：既存イベント）
-        st = "closed" if cls_cnt > 0 else ("regulated" if reg_cnt > 0 else "open")
-
-        # --- ★山梨 公式リンク＋規制情報（kisei.php?id=…）の付与／上書き ---
-        official = {}
-        yn_rows = yn_registry.get(nm) or []
-        if yn_rows:
-            # URL は必ず付与（先頭を採用）
-            y0 = yn_rows[0]
-            official["yamanashi"] = {
-                "name": y0.get("name") or raw_name,
-                "url":  y0.get("url") or "",
-                "note": "pref.yamanashi list.php registry match by normalized name"
-            }
-            # 規制情報は closed > regulated > open の優先で上書き
-            yn_status = None
-            yn_best = None
-            for r in yn_rows:
-                s = (r.get("status") or "").lower()
-                if not s: continue
-                if (yn_status is None) or (SEV.get(s,1) > SEV.get(yn_status,1)):
-                    yn_status = s
-                    yn_best = r
-            if yn_status:
-                st = yn_status  # ★県サイトで上書き
-                # 補助属性も書き込む
-                if yn_best:
-                    for k in ("reg_from","reg_to","reg_reason","updated_at"):
-                        v = yn_best.get(k)
-                        if v: p[k] = v
-
-        # properties 構築
-        props = {
-            "id": p.get("id"),
-            "name": raw_name,
-            "norm_name": nm,
-            "pref_code": pc,
-            "pref_name": pref_name,
-            "highway": p.get("highway"),
-            "tracktype": p.get("tracktype"),
-            "access": p.get("access"),
-            "motor_vehicle": p.get("motor_vehicle"),
-            "service": p.get("service"),
-            "surface": p.get("surface"),
-            "status": st,                # ← 色分けはここを見る（closed/regulated/open）
-            "regulated": reg_cnt,
-            "closed": cls_cnt,
-            "status_jp": (rep.get("status_jp") if rep else "") or "",
-            "source_url": (rep.get("source_url") if rep else "") or "",
-            "source": "OSM",
-        }
-        if official:
-            props["official"] = official  # ← map.html でリンク表示に利用
-
-        # 県サイトから補助属性を付けていたら反映（上で p[...] に入れている）
-        for k in ("reg_from","reg_to","reg_reason","updated_at"):
-            if p.get(k): props[k] = p[k]
-
-        feats_out.append({
-            "type": "Feature",
-            "geometry": f.get("geometry"),
-            "properties": props,
-        })
-
-    OUT.write_text(
-        json.dumps({"type": "FeatureCollection", "features": feats_out},
-                   ensure_ascii=False, separators=(",", ":")),
-        encoding="utf-8",
-    )
-    print(f"[OK] roads.geojson written: {len(feats_out)} features  matched={matched}  → {OUT}")
+    # Feature は読んだ順に書き出す（全件をリストに溜めない）
+    with open(OUT, "wb", buffering=1 << 20) as out:
+        out.write(b'{"type":"FeatureCollection","features":[')
+        if args.workers <= 1:
+            for f in iter_features(IN_MASTER):
+                if n_out:
+                    out.write(b",")
+                out.write(_dumps(convert_feature(f, idx)))
+                n_out += 1
+        else:
+            # 先読みはワーカー数の 2 倍バッチまで（入力を全部抱え込まない）。順序は入力どおり
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=args.workers, initializer=_init_worker, initargs=(idx,)) as ex:
+                pending = collections.deque()
+
+                def flush_one():
+                    nonlocal n_out
+                    n, fut = pending.popleft()
+                    if n_out:
+                        out.write(b",")
+                    out.write(fut.result())
+                    n_out += n
+
+                for batch in _batches(iter_features(IN_MASTER), BATCH):
+                    pending.append((len(batch), ex.submit(_convert_batch, batch)))
+                    if len(pending) >= args.workers * 2:
+                        flush_one()
+                while pending:
+                    flush_one()
+        out.write(b"]}")
+
+    print(f"[OK] roads.geojson written: {n_out} features  matched={matched}  → {OUT}")
 
 if __name__ == "__main__":
     main()
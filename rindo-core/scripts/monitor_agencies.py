@@ -11,7 +11,7 @@ monitor_agencies.py  v0.6.0
 - 画像(JPG/PNG): OCR→正規表現
 - reg_events.json へマージ（pref + pref_code + source_url + updated_at 付与）
 """
-import argparse, datetime, hashlib, io, json, re, unicodedata, urllib.parse
+import argparse, asyncio, base64, codecs, collections, concurrent.futures, datetime, functools, hashlib, io, json, os, re, unicodedata, urllib.parse
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -20,22 +20,41 @@ from selectolax.parser import HTMLParser
 import re
 import unicodedata
 
+_JP_PAREN_PAT = re.compile(r"[（(].*?[)）]")
+# 1 文字単位の削除は re.sub ではなく str.translate で（\s と同じ空白文字の集合を含める）
+_WS_CHARS = "".join(c for c in map(chr, range(0x3001)) if c.isspace())  # 空白は U+3000 までにしか無い
+_JP_SEP_TABLE = str.maketrans("", "", _WS_CHARS + "　・･‐-—―ｰ")
+
+def _strip_tail(t: str, tails: Tuple[str, ...]) -> str:
+    """末尾の接尾語を 1 つだけ落とす（tails は長い順＝正規表現の選択肢と同じ優先順）"""
+    for x in tails:
+        if t.endswith(x):
+            return t[:-len(x)]
+    return t
+
 def _norm_name_jp(s: str) -> str:
     """林道名 → マッチ用の素朴な正規化（monitor と揃える）"""
     if not s:
         return ""
     t = unicodedata.normalize("NFKC", s)
     # 括弧や余計な記号・スペースを落とし、末尾の「林道/線/支線」などを除去
-    t = re.sub(r"[（(].*?[)）]", "", t)
-    t = re.sub(r"[　\s・･‐\-—―ｰ]", "", t)
+    t = _JP_PAREN_PAT.sub("", t)
+    t = t.translate(_JP_SEP_TABLE)
     t = t.replace("森林管理道", "").replace("林道", "")
-    t = re.sub(r"(支線|線|せん|道)$", "", t)
+    t = _strip_tail(t, ("支線", "線", "せん", "道"))
     return t
 
 # === Yamanashi helpers ===
 import re, unicodedata
 from html import unescape
 
+_YN_RUBY_PAT = re.compile(r"【[^】]*】")
+_YN_PAREN_PAT = re.compile(r"[（(].*?[)）]")
+_YN_SEP_PAT = re.compile(r"[・･‐\-—―ｰ／/､,，、\s]+")
+_YN_TAIL_PAT = re.compile(r"(支線)?線$")
+_YN_TAG_PAT = re.compile(r"(?is)<[^>]+>")
+_YN_SPLIT_PAT = re.compile(r"[／/、,，・･\s]+")
+
 def _yn_norm_name(s: str) -> str:
     """林道名を roads/make_roads と揃う形に正規化"""
     if not s: return ""
@@ -45,23 +64,23 @@ def _yn_norm_name(s: str) -> str:
     t = t.replace("県営","").replace("市営","").replace("町営","").replace("村営","")
     t = t.replace("森林管理道","")
     # カッコ・ルビ等
-    t = re.sub(r"【[^】]*】","", t)
-    t = re.sub(r"[（(].*?[)）]","", t)
+    t = _YN_RUBY_PAT.sub("", t)
+    t = _YN_PAREN_PAT.sub("", t)
     # 区切り記号や空白
-    t = re.sub(r"[・･‐\-—―ｰ／/､,，、\s]+","", t)
+    t = _YN_SEP_PAT.sub("", t)
     # 接尾語の削除
     t = t.replace("林道","")
-    t = re.sub(r"(支線)?線$","", t)
+    t = _YN_TAIL_PAT.sub("", t)
     return t
 
 def _yn_split_names(raw: str) -> list[str]:
     """『小森川／本谷釜瀬・御岳』のようなセルを名前配列に分割"""
     if not raw: return []
     # タグ消し
-    val = re.sub(r"(?is)<[^>]+>", " ", raw)
+    val = _YN_TAG_PAT.sub(" ", raw)
     val = unicodedata.normalize("NFKC", unescape(val))
     # 全角/半角スラッシュ・読点・中黒・空白で分割
-    parts = re.split(r"[／/、,，・･\s]+", val)
+    parts = _YN_SPLIT_PAT.split(val)
     parts = [p.strip() for p in parts if p.strip()]
     # 末尾「線」「林道」などは _yn_norm_name 側で落ちる
     return parts
@@ -75,6 +94,15 @@ except Exception:  # pragma: no cover
     except Exception:
         pdf_extract_text = None  # type: ignore
 
+# PyMuPDF があればテキスト層の抽出はこちら（pdfminer より桁違いに速く、ページ単位で画像だけのページも分かる）
+try:
+    import pymupdf as fitz  # type: ignore
+except ImportError:
+    try:
+        import fitz  # type: ignore  # 旧パッケージ名
+    except ImportError:
+        fitz = None
+
 # --- Prefecture master (JIS X 0401, zero-padded 2 digits) ---
 PREF_NAME2CODE = {
     "北海道":"01","青森県":"02","岩手県":"03","宮城県":"04","秋田県":"05","山形県":"06","福島県":"07",
@@ -91,6 +119,7 @@ PREF_CODE2NAME = {v: k for k, v in PREF_NAME2CODE.items()}
 
 YAMANASHI_HOSTS = {"www.pref.yamanashi.jp", "pref.yamanashi.jp"}
 
+@functools.lru_cache(maxsize=65536)  # 同じリンクが何ページにも出てくるので urllib.parse を何度も通さない
 def canonical_url(url: str) -> str:
     """#アンカー（#...）と area_id を除去して正規化"""
     u = url.split('#', 1)[0]
@@ -98,12 +127,15 @@ def canonical_url(url: str) -> str:
     q = [(k, v) for (k, v) in urllib.parse.parse_qsl(sp.query, keep_blank_values=True) if k != 'area_id']
     return urllib.parse.urlunsplit((sp.scheme, sp.netloc, sp.path, urllib.parse.urlencode(q, doseq=True), ""))
 
+_SPACES_PAT = re.compile(r"\s+")
+_NORM_JP_HEAD_PAT = re.compile(r"^(山梨県|県営|県|市町村)?")
+
 def _norm_jp(s: str) -> str:
     if not s:
         return ""
     s = unicodedata.normalize("NFKC", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    s = re.sub(r"^(山梨県|県営|県|市町村)?", "", s)  # 軽いノイズ除去
+    s = _SPACES_PAT.sub(" ", s).strip()
+    s = _NORM_JP_HEAD_PAT.sub("", s)  # 軽いノイズ除去
     return s
 
 def _make_event_yamanashi(name: str, status: str, url: str, now_iso: str) -> dict:
@@ -134,18 +166,36 @@ _YMN_OPEN_PAT = re.compile(r"(規制はありません|規制なし)")
 # “規制”キーワード。速度/幅員/重量など数値ルールが出ている場合も規制扱い
 _YMN_REG_PAT = re.compile(r"(規制|片側|交互|迂回|う回|チェーン|チェーン規制)")
 
+_YMN_ADMIN_PAT = re.compile(r"県営|市営|町営|村営")   # 1 パスで（順に replace すると「市県営営」が二重に消える）
+_YMN_WS_TABLE = str.maketrans("", "", _WS_CHARS)
+# 記号・空白の削除（－/– は元々 "-" に置き換えてから消していたので、ここで直接消す）
+_YMN_PUNCT_TABLE = str.maketrans("", "", _WS_CHARS + "（）()・･‐-—―ｰ　－–")
+
+# list.php / kisei.php の解析用
+_YMN_LIST_HREF_PAT = re.compile(r"/rindoujyouhou/kisei\.php\?id=\d+$", re.IGNORECASE)
+_YMN_LINK_NAME_PAT = re.compile(r"林道\s*([^【\s]+)")
+_YMN_LINK_NOISE_PAT = re.compile(r"[県市]営|森林管理道|林道|支線|線|\s+")
+_YMN_TH_RINDO_PAT = re.compile(r"(?is)<th[^>]*>\s*林道名\s*</th>\s*<td[^>]*>(?P<td>.*?)</td>")
+_YMN_LABEL_PAT = re.compile(r"林道名[^：:]*[:：]\s*(?P<val>.+?)(?:<|[\r\n])")
+_YMN_TITLE_PAT = re.compile(r"(?is)<title[^>]*>(.*?)</title>")
+_YMN_TITLE_TAG_PAT = re.compile(r"<[^>]+>")
+_YMN_TITLE_TAIL_PAT = re.compile(r"規制.*$")
+_YMN_SCRIPT_STYLE_PAT = re.compile(r"(?is)<(script|style)[^>]*>.*?</\1>")
+_YMN_PAGE_CLOSED_PAT = re.compile(r"(通行止|全面通行止|通年通行止)")
+_YMN_HAS_REG_PAT = re.compile(r"(規制(?!はありません)|片側|交互|う回|迂回|チェーン|徐行|幅員|速度|重量)")
+_YMN_NUM_UNIT_PAT = re.compile(r"\b\d+(?:\.\d+)?\s*(?:km/?h|㎞/?h|m|t)\b")
+
 def _yn_norm_name(s: str) -> str:
     """イベントとマスターで合わせやすい素朴正規化（make_roads_from_master.py と同等）"""
     if not s:
         return ""
     s = unescape(s)
-    s = re.sub(r"\s+", "", s)
-    s = re.sub(r"[（(].*?[)）]", "", s)  # 括弧内削除
-    s = s.replace("－", "-").replace("―", "-").replace("–", "-")
-    s = re.sub(r"(森林管理道)", "", s)
-    s = re.sub(r"(県営|市営|町営|村営)", "", s)
+    s = s.translate(_YMN_WS_TABLE)
+    s = _YN_PAREN_PAT.sub("", s)  # 括弧内削除
+    s = s.replace("森林管理道", "")
+    s = _YMN_ADMIN_PAT.sub("", s)
     s = s.replace("林道", "").replace("支線", "").replace("線", "")
-    s = re.sub(r"[（）()・･‐\-—―ｰ\s　]", "", s)
+    s = s.translate(_YMN_PUNCT_TABLE)
     return s
 
 def _yn_pick_status(page_text: str) -> tuple[str, str]:
@@ -165,29 +215,26 @@ def _yn_pick_status(page_text: str) -> tuple[str, str]:
         return "regulated", "規制"
     return "open", "開放"
 
-def parse_yamanashi_list(html: str, url: str, now_iso: str) -> list[dict]:
+def parse_yamanashi_list(html: str, url: str, now_iso: str, doc: Optional[HTMLParser] = None) -> list[dict]:
     """
     https://www.pref.yamanashi.jp/rindoujyouhou/list.php
     一覧から個別ページへのリンクを取り出す（イベントは作らない）。
     戻り値: {"name": aテキスト, "norm_name": 推定名, "url": 絶対URL} の配列
     """
-    from bs4 import BeautifulSoup
-    import re
-    from html import unescape
-
-    sou = BeautifulSoup(html, "html.parser")
+    if doc is None:
+        doc = HTMLParser(html or "")
     items = []
-    for a in sou.find_all("a", href=True):
-        href = a["href"]
-        if re.search(r"/rindoujyouhou/kisei\.php\?id=\d+$", href, re.IGNORECASE):
-            text = unescape(a.get_text(" ", strip=True))
+    for a in doc.css("a[href]"):
+        href = a.attributes.get("href") or ""
+        if _YMN_LIST_HREF_PAT.search(href):
+            text = unescape(a.text(separator=" ", strip=True))
             name = text
             # aテキストからざっくり路線名を拾う（なくてもOK）
-            m = re.search(r"林道\s*([^【\s]+)", text)
+            m = _YMN_LINK_NAME_PAT.search(text)
             if m:
                 name = m.group(1)
-            norm_name = re.sub(r"【[^】]*】", "", name)
-            norm_name = re.sub(r"[県市]営|森林管理道|林道|支線|線|\s+", "", norm_name)
+            norm_name = _YN_RUBY_PAT.sub("", name)
+            norm_name = _YMN_LINK_NOISE_PAT.sub("", norm_name)
             items.append({
                 "name": text,
                 "norm_name": norm_name,
@@ -220,31 +267,30 @@ def parse_yamanashi_kisai(html: str, url: str, now_iso: str) -> list[dict]:
     # --- 1) 林道名セルを抽出 ---
     names_blk = ""
     # <th>林道名</th><td>…</td> を優先
-    m = re.search(r"(?is)<th[^>]*>\s*林道名\s*</th>\s*<td[^>]*>(?P<td>.*?)</td>", html)
+    m = _YMN_TH_RINDO_PAT.search(html)
     if m:
         names_blk = m.group("td")
     else:
         # ラベル＋テキスト形式: 「林道名：…」
-        m2 = re.search(r"林道名[^：:]*[:：]\s*(?P<val>.+?)(?:<|[\r\n])", html)
+        m2 = _YMN_LABEL_PAT.search(html)
         if m2: names_blk = m2.group("val")
 
     raw_names = _yn_split_names(names_blk)
     # タイトル等からの最後の保険
     if not raw_names:
-        t = re.search(r"(?is)<title[^>]*>(.*?)</title>", html)
+        t = _YMN_TITLE_PAT.search(html)
         if t:
-            title = re.sub(r"<[^>]+>", "", t.group(1))
-            title = re.sub(r"規制.*$", "", title)
+            title = _YMN_TITLE_TAG_PAT.sub("", t.group(1))
+            title = _YMN_TITLE_TAIL_PAT.sub("", title)
             raw_names = [title.strip()]
 
     # --- 2) status 判定（通行止 > 規制 > 開放） ---
-    plain = re.sub(r"(?is)<(script|style)[^>]*>.*?</\1>", " ", html)
-    plain = re.sub(r"(?is)<[^>]+>", " ", plain)
-    plain = re.sub(r"\s+", " ", unescape(plain))
-    is_closed = re.search(r"(通行止|全面通行止|通年通行止)", plain)
-    has_reg = re.search(r"(規制(?!はありません)|片側|交互|う回|迂回|チェーン|徐行|幅員|速度|重量)", plain) \
-              or re.search(r"\b\d+(?:\.\d+)?\s*(?:km/?h|㎞/?h|m|t)\b", plain)
-    is_open = re.search(r"(規制はありません|規制なし)", plain)
+    plain = _YMN_SCRIPT_STYLE_PAT.sub(" ", html)
+    plain = _YN_TAG_PAT.sub(" ", plain)
+    plain = _SPACES_PAT.sub(" ", unescape(plain))
+    is_closed = _YMN_PAGE_CLOSED_PAT.search(plain)
+    has_reg = _YMN_HAS_REG_PAT.search(plain) or _YMN_NUM_UNIT_PAT.search(plain)
+    is_open = _YMN_OPEN_PAT.search(plain)
 
     if is_closed:
         status = "closed"
@@ -259,9 +305,8 @@ def parse_yamanashi_kisai(html: str, url: str, now_iso: str) -> list[dict]:
     for nm in (raw_names or [""]):
         norm = _yn_norm_name(nm)
         if not norm: continue
-        key = ("19", norm)
-        if key in seen: continue
-        seen.add(key)
+        if norm in seen: continue  # 山梨(19)固定なので名前だけで重複判定
+        seen.add(norm)
         events.append({
             "pref": "山梨県",
             "pref_code": "19",
@@ -281,7 +326,11 @@ STATE_FILE = ROOT / "data" / "monitor" / "state.json"
 PAGES_DIR  = ROOT / "data" / "monitor" / "pages"
 FILES_DIR  = ROOT / "data" / "monitor" / "files"
 
-TIMEOUT = 20
+TIMEOUT = 20   # 読み取りタイムアウト（秒）
+# 接続・プール待ちは短く切り、遅いサーバでも読み取りだけ TIMEOUT まで待つ
+HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=TIMEOUT, write=10.0, pool=5.0)
+HTTP_LIMITS  = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=30.0)
+HTTP_RETRIES = 2   # 接続エラー時の再試行（httpx のトランスポートが接続段階だけやり直す）
 UA = "rindo-monitor/0.6.0"
 JST = datetime.timezone(datetime.timedelta(hours=9), "JST")
 
@@ -292,6 +341,12 @@ PATH_HINTS_DEF = [
     r"/road", r"/douro", r"/kisei", r"/bosai", r"/news", r"/oshirase", r"/koho"
 ]
 
+# regex モジュールがあれば一部のパターンはそちらで（無ければ標準 re）
+try:
+    import regex as re2  # type: ignore
+except ImportError:
+    re2 = re
+
 # ---------- ステータス/理由/期間パターン ----------
 P_STATUS = [
     (re.compile(r"(全面|全線)?通行止(め)?"), "通行止"),
@@ -302,11 +357,30 @@ REASONS = ["落石","倒木","崩落","土砂(崩れ|流出)","凍結","積雪",
 P_REASON = re.compile("|".join(REASONS))
 P_RANGE  = re.compile(r"(?P<from>\d{4}[./-]\d{1,2}[./-]\d{1,2})(?:[^0-9]{0,6})(?:～|~|−|-|—|–|至|まで|から|より)(?P<to>\d{4}[./-]\d{1,2}[./-]\d{1,2}|未定|当面の間|当面|未定)")
 P_DATE_SINGLE = re.compile(r"(?P<d>\d{4}[./-]\d{1,2}[./-]\d{1,2})")
+# ステータスと理由を 1 回の走査で拾う（s0>s1>s2 の順に優先。P_STATUS と同じ判定になる語だけに絞ってある。
+# ステータス語と理由語は文字が重ならないので、左から順に拾っても互いを隠さない）
+P_STATUS_REASON = re.compile(
+    r"(?P<s0>通行止)|(?P<s1>規制|片側交互)|(?P<s2>解除|通行可)|(?P<reason>"
+    + "|".join(r.replace("(", "(?:") for r in REASONS) + ")"
+)
+_STATUS_LABEL = {"s0": "通行止", "s1": "規制", "s2": "解除"}
 
 # 名前抽出（森林管理道も対象）
-P_RINDO_1 = re.compile(r"(林道|森林管理道)(?P<n>[\w０-９0-9一-龥ぁ-んァ-ヶ々ー・･\- \u3000]{2,30}?)(?:線|せん|道)?")
+# P_RINDO_1: 最短一致の {2,30}? の後ろが省略可能な語だけなので、名前部分は常にちょうど 2 文字になる。
+#   {2} と書いて同じ結果のまま後戻りを無くす
+P_RINDO_1 = re.compile(r"(林道|森林管理道)(?P<n>[\w０-９0-9一-龥ぁ-んァ-ヶ々ー・･\- \u3000]{2})(?:線|せん|道)?")
+# P_RINDO_2: 終端語から最大 30 文字しか遡らないので、終端語の手前だけを探す（_rindo2_names）
 P_RINDO_2 = re.compile(r"(?P<n>[\w０-９0-9一-龥ぁ-んァ-ヶ々ー・･\- \u3000]{2,30}?)(?:林道|森林管理道|林道線)")
+_RINDO2_TAILS = ("林道", "森林管理道")
 NAME_HEAD_RE = re.compile(r"(路線名|林道名|森林管理道名|名称|路線|路線等|路線番号)")
+P_LINE_STATUS = re.compile(r"(通行止|規制|解除|通行可|通行可能)")   # li/p・本文行の足切り
+P_GENERIC_JP = re2.compile(  # この形は regex モジュールの方が速い（P_RINDO_* は標準 re の方が速いので re のまま）
+    r"(?P<name>[\u4E00-\u9FFFぁ-んァ-ヶ0-9一二三四五六七八九十〇・\-]+?(?:支)?線).{0,8}?"
+    r"(?P<status>通行止|通行規制|片側交互通行|一部通行|う回|迂回|解除|通行可)"
+)
+P_RINDO_SPACE = str.maketrans("", "", _WS_CHARS + "　")
+P_RINDO_TAILS = ("線", "せん", "道")
+P_RINDO_PUNCT = str.maketrans("", "", "（）()・･‐-—―ｰ")
 BAD_NAME_SUBSTR = ("路線名","市町村","現在","管理","センター","注意","について","お知らせ")
 
 # ---------- 共通ユーティリティ ----------
@@ -319,7 +393,8 @@ def ensure_pref_fields(ev: dict, pref_name: str) -> dict:
     return ev
 
 def sha1b(b: bytes) -> str:
-    return hashlib.sha1(b).hexdigest()
+    # 16進 40 文字ではなく生ダイジェストの base64（28 文字）で持つ
+    return base64.b64encode(hashlib.sha1(b).digest()).decode("ascii")
 
 def load_json(p: Path, default):
     try:
@@ -327,26 +402,64 @@ def load_json(p: Path, default):
     except Exception:
         return default
 
-def save_json(p: Path, obj):
+def save_json(p: Path, obj, indent: Optional[int] = 2):
     p.parent.mkdir(parents=True, exist_ok=True)
     # ここを UTF-8 with BOM で保存するように変更（PowerShell が既定で正しく読める）
-    p.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8-sig")
+    # 途中で落ちても元ファイルが壊れないよう、隣の .tmp に書いてから置き換える
+    text = (json.dumps(obj, ensure_ascii=False, indent=indent) if indent is not None
+            else json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8-sig")
+    os.replace(tmp, p)
+
+# state.json は列ごとの配列で保存する {"urls":[...], "etag":[...], ...}（URL ごとにキー名を繰り返さない）
+# file は FILES_DIR に置いたその URL の現行 PDF（中身のハッシュ名）
+STATE_COLS = ("etag", "last_modified", "length", "sha1", "checked_at", "file")
+
+def load_state(p: Path) -> Dict[str, Dict[str, Any]]:
+    """state.json を URL → {etag, ...} に展開。旧形式（URL ごとの dict・16進 sha1）もそのまま読める"""
+    raw = load_json(p, {})
+    if isinstance(raw.get("urls"), list):
+        cols = [raw.get(k) or [] for k in STATE_COLS]
+        state = {u: {k: (c[i] if i < len(c) else None) for k, c in zip(STATE_COLS, cols)}
+                 for i, u in enumerate(raw["urls"])}
+    else:
+        state = raw
+    for st in state.values():
+        h = st.get("sha1")
+        if isinstance(h, str) and len(h) == 40:
+            try:
+                st["sha1"] = base64.b64encode(bytes.fromhex(h)).decode("ascii")
+            except ValueError:
+                pass
+    return state
+
+def save_state(p: Path, state: Dict[str, Dict[str, Any]]):
+    urls = list(state)
+    obj: Dict[str, Any] = {"urls": urls}
+    for k in STATE_COLS:
+        obj[k] = [state[u].get(k) for u in urls]
+    save_json(p, obj, indent=None)
 
 
 def _abs(base: str, href: str) -> str:
     return urllib.parse.urljoin(base, href)
 
+@functools.lru_cache(maxsize=65536)
+def _netloc_of(url: str) -> str:
+    return urllib.parse.urlparse(url).netloc
+
 def _same_domain(url: str, domains: List[str]) -> bool:
-    host = urllib.parse.urlparse(url).netloc
+    host = _netloc_of(url)
     return any(host.endswith(d) for d in domains)
 
 # ---------- 正規化/判定 ----------
 def norm_rindo_name(s: str) -> str:
     if not s: return ""
-    t = re.sub(r"[　\s]", "", s)
+    t = s.translate(P_RINDO_SPACE)
     t = t.replace("林道","").replace("森林管理道","")
-    t = re.sub(r"(線|せん|道)$", "", t)
-    t = re.sub(r"[（）()・･‐\-—―ｰ]", "", t)
+    t = _strip_tail(t, P_RINDO_TAILS)
+    t = t.translate(P_RINDO_PUNCT)
     return t
 
 def pick_status(text: str) -> Optional[str]:
@@ -359,6 +472,18 @@ def pick_reason(text: str) -> Optional[str]:
     m = P_REASON.search(text or "")
     return m.group(0) if m else None
 
+def pick_status_reason(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """pick_status(text), pick_reason(text) を 1 パスで"""
+    best = reason = None
+    for m in P_STATUS_REASON.finditer(text or ""):
+        g = m.lastgroup
+        if g == "reason":
+            if reason is None:
+                reason = m.group()
+        elif best is None or g < best:
+            best = g
+    return (_STATUS_LABEL[best] if best else None), reason
+
 def pick_range(text: str) -> Tuple[Optional[str], Optional[str]]:
     m = P_RANGE.search(text or "")
     if m:
@@ -366,12 +491,37 @@ def pick_range(text: str) -> Tuple[Optional[str], Optional[str]]:
     m2 = P_DATE_SINGLE.search(text or "")
     return ((m2.group("d"), None) if m2 else (None, None))
 
+def _rindo2_names(text: str) -> List[str]:
+    """
+    P_RINDO_2.findall(text) と同じ結果。一致の開始位置は次の終端語の 30 文字手前より前にはならないので、
+    終端語ごとに [終端語-30, 終端語の末尾) の範囲だけを正規表現に見せる（長い本文で全位置を試さない）
+    """
+    out: List[str] = []
+    pos = look = 0
+    while True:
+        q, ql = -1, 0
+        for tail in _RINDO2_TAILS:
+            i = text.find(tail, max(pos + 2, look))
+            if i >= 0 and (q < 0 or i < q):
+                q, ql = i, len(tail)
+        if q < 0:
+            return out
+        m = P_RINDO_2.search(text, max(pos, q - 30), q + ql)
+        if m is None:  # この終端語で終わる一致は無い→次の終端語へ（開始位置 pos はそのまま）
+            look = q + 1
+            continue
+        out.append(m.group("n"))
+        pos = m.end()
+
 def pick_names(text: str) -> List[str]:
+    text = text or ""
+    if "林道" not in text and "森林管理道" not in text:  # どちらのパターンもこの語が必須
+        return []
     names = set()
-    for m in P_RINDO_1.finditer(text or ""):
-        names.add(norm_rindo_name(m.group("n")))
-    for m in P_RINDO_2.finditer(text or ""):
-        names.add(norm_rindo_name(m.group("n")))
+    for _, n in P_RINDO_1.findall(text):
+        names.add(norm_rindo_name(n))
+    for n in _rindo2_names(text):
+        names.add(norm_rindo_name(n))
     clean = []
     for n in names:
         if not n or len(n) < 2:
@@ -382,8 +532,18 @@ def pick_names(text: str) -> List[str]:
     return clean
 
 # ---------- HTML 抽出（表→リスト→本文） ----------
-def harvest_from_html(html: str) -> List[Dict[str, Any]]:
-    doc = HTMLParser(html or "")
+_HAS_TABLE_PAT = re.compile(r"<table", re.I)
+
+def harvest_from_html(html: str, doc: Optional[HTMLParser] = None) -> List[Dict[str, Any]]:
+    """doc に同じ html の HTMLParser を渡せば作り直さない（run_async でリンク探索と共有する）"""
+    html = html or ""
+    # li/p・本文行は「林道/管理道」を含む行しか拾わないので、ページ全体に無ければ丸ごと飛ばせる。
+    # 表は「路線名」列から林道語なしで名前を取れるため、<table> があるときだけ DOM を作る
+    has_kw = "林道" in html or "管理道" in html
+    if not has_kw and not _HAS_TABLE_PAT.search(html):
+        return []
+    if doc is None:
+        doc = HTMLParser(html)
     events: List[Dict[str, Any]] = []
 
     # table 優先（名前列推定あり）
@@ -415,7 +575,7 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
             if len(cells) < 2:
                 continue
             row_text = " ".join(cells)
-            st = pick_status(row_text)
+            st, reason = pick_status_reason(row_text)
             if not st:
                 continue
             nm_raw = ""
@@ -432,20 +592,24 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
                 "name": nm + "林道",
                 "norm_name": nm,
                 "status": st,
-                "reason": pick_reason(row_text),
+                "reason": reason,
                 "from": f, "to": t,
                 "snippet": row_text[:160]
             })
 
+    if not has_kw:
+        return events
+
     # li / p
     for sel in ("li", "p"):
         for node in doc.css(sel):
             line = (node.text() or "").strip()
             if not line:
                 continue
-            if ("林道" not in line and "管理道" not in line) or not re.search(r"(通行止|規制|解除|通行可|通行可能)", line):
+            if ("林道" not in line and "管理道" not in line) or not P_LINE_STATUS.search(line):
                 continue
-            st = pick_status(line) or "規制"
+            st, reason = pick_status_reason(line)
+            st = st or "規制"
             f, t = pick_range(line)
             for n in pick_names(line) or []:
                 nm = norm_rindo_name(n)
@@ -455,7 +619,7 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
                     "name": nm + "林道",
                     "norm_name": nm,
                     "status": st,
-                    "reason": pick_reason(line),
+                    "reason": reason,
                     "from": f, "to": t,
                     "snippet": line[:160]
                 })
@@ -466,9 +630,10 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
         line = (line or "").strip()
         if not line:
             continue
-        if ("林道" not in line and "管理道" not in line) or not re.search(r"(通行止|規制|解除|通行可|通行可能)", line):
+        if ("林道" not in line and "管理道" not in line) or not P_LINE_STATUS.search(line):
             continue
-        st = pick_status(line) or "規制"
+        st, reason = pick_status_reason(line)
+        st = st or "規制"
         f, t = pick_range(line)
         for n in pick_names(line) or []:
             nm = norm_rindo_name(n)
@@ -478,7 +643,7 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
                 "name": nm + "林道",
                 "norm_name": nm,
                 "status": st,
-                "reason": pick_reason(line),
+                "reason": reason,
                 "from": f, "to": t,
                 "snippet": line[:160]
             })
@@ -486,14 +651,11 @@ def harvest_from_html(html: str) -> List[Dict[str, Any]]:
 
 # ---------- フォールバック: プレーンテキストから抽出 ----------
 def extract_generic_jp(text: str, base_url: str = "", pref: str = "") -> List[Dict[str, Any]]:
-    rx = re.compile(
-        r"(?P<name>[\u4E00-\u9FFFぁ-んァ-ヶ0-9一二三四五六七八九十〇・\-]+?(?:支)?線).{0,8}?"
-        r"(?P<status>通行止|通行規制|片側交互通行|一部通行|う回|迂回|解除|通行可)"
-    )
     out = []
-    for m in rx.finditer(text or ""):
-        raw = m.group("name")
-        stj = m.group("status")
+    text = text or ""
+    if "線" not in text:  # 名前は必ず「…線」で終わる
+        return out
+    for raw, stj in P_GENERIC_JP.findall(text):
         code = ("closed" if "通行止" in stj else
                 "regulated" if any(k in stj for k in ("規制","片側交互通行","一部")) else
                 "open" if any(k in stj for k in ("解除","通行可")) else "")
@@ -513,6 +675,14 @@ def extract_generic_jp(text: str, base_url: str = "", pref: str = "") -> List[Di
 
 # ---------- PDF/画像：抽出ヘルパ ----------
 def extract_text_from_pdf_bytes(data: bytes) -> str:
+    if fitz is not None:
+        try:
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                txt = "\n".join(page.get_text("text") for page in doc).strip()
+            if txt:
+                return txt
+        except Exception:
+            pass  # 壊れた PDF などは pdfminer でもう一度
     if not pdf_extract_text:
         return ""
     try:
@@ -529,42 +699,222 @@ def ocr_bytes_image_to_text(b: bytes) -> str:
     except Exception:
         return ""
 
+# OCR 設定: 告知 PDF は単純な文字組みなので 200dpi・グレースケール・tessdata_fast で十分。
+# 文字がほとんど取れなかったときだけ 300dpi でやり直す
+OCR_DPI = 200
+OCR_RETRY_DPI = 300
+TESSDATA_DIR = os.environ.get("RINDO_TESSDATA", "/usr/share/tessdata_fast")
+
+def _tess_config() -> str:
+    cfg = "--oem 1 --psm 6"
+    if TESSDATA_DIR and os.path.isdir(TESSDATA_DIR):  # 無ければ既定の tessdata を使う
+        cfg += f' --tessdata-dir "{TESSDATA_DIR}"'
+    return cfg
+
+def _ocr_pages_batch(pages, lang: str = "jpn", config: str = "") -> str:
+    """
+    複数ページを tesseract 1 プロセスでまとめて OCR（画像パスを並べた list.txt を渡す）。
+    ページごとに呼ぶと毎回プロセス起動と jpn モデルの読み込みが走るため。
+    """
+    import tempfile
+    import pytesseract
+    with tempfile.TemporaryDirectory(prefix="rindo-ocr-") as td:
+        paths = []
+        for i, p in enumerate(pages):
+            fp = os.path.join(td, f"p{i:04d}.png")
+            p.save(fp)
+            paths.append(fp)
+        lst = os.path.join(td, "list.txt")
+        with open(lst, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths) + "\n")
+        return pytesseract.image_to_string(lst, lang=lang, config=config)
+
+def _ocr_pdf_at(b: bytes, dpi: int) -> str:
+    from pdf2image import convert_from_bytes
+    import pytesseract
+    pages = convert_from_bytes(b, dpi=dpi, fmt="png", grayscale=True)
+    if not pages:
+        return ""
+    config = _tess_config()
+    txt = ""
+    if len(pages) > 1:
+        try:
+            txt = _ocr_pages_batch(pages, config=config)
+        except Exception:
+            txt = ""
+    if not txt.strip():  # 1 ページだけ、またはまとめ処理が空/失敗ならページごと
+        txt = "\n".join(pytesseract.image_to_string(p, lang="jpn", config=config) for p in pages)
+    return txt.strip()
+
+OCR_PAGE_MIN_CHARS = 20  # テキスト層がこれ未満のページはスキャンとみなし、そのページだけ OCR する
+
+def extract_text_from_pdf_bytes_per_page(data: bytes) -> Optional[List[str]]:
+    """ページごとのテキスト層（PyMuPDF → pdfminer の順）。どちらも無い・読めない PDF は None"""
+    if fitz is not None:
+        try:
+            with fitz.open(stream=data, filetype="pdf") as doc:
+                return [page.get_text("text").strip() for page in doc]
+        except Exception:
+            pass
+    try:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+    except ImportError:
+        return None
+    try:
+        return ["".join(el.get_text() for el in page if isinstance(el, LTTextContainer)).strip()
+                for page in extract_pages(io.BytesIO(data))]
+    except Exception:
+        return None
+
+def _render_pdf_pages(b: bytes, idxs: List[int], n_pages: int) -> List[Tuple[int, Any]]:
+    """指定ページ（0 始まり）を OCR 用のグレースケール画像に。PyMuPDF なら画像を含まないページは飛ばす"""
+    if fitz is not None:
+        from PIL import Image
+        out = []
+        with fitz.open(stream=b, filetype="pdf") as doc:
+            for i in idxs:
+                page = doc[i]
+                if not page.get_images():
+                    continue
+                pix = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+                out.append((i, Image.frombytes("L", (pix.width, pix.height), pix.samples)))
+        return out
+    from pdf2image import convert_from_bytes
+    if len(idxs) == n_pages:  # 全ページなら 1 回で
+        return list(zip(idxs, convert_from_bytes(b, dpi=OCR_DPI, fmt="png", grayscale=True)))
+    return [(i, img) for i in idxs
+            for img in convert_from_bytes(b, dpi=OCR_DPI, first_page=i + 1, last_page=i + 1, fmt="png", grayscale=True)]
+
+def _pdf_text_paged(b: bytes) -> Optional[str]:
+    """
+    ページごとにテキスト層を読み、文字が OCR_PAGE_MIN_CHARS 未満のページだけ OCR して元の位置に差し込む。
+    テキスト層を読めない PDF は None（呼び出し側で従来経路へ）。
+    """
+    parts = extract_text_from_pdf_bytes_per_page(b)
+    if parts is None:
+        return None
+    thin = [i for i, t in enumerate(parts) if len(t) < OCR_PAGE_MIN_CHARS]
+    if thin:
+        try:
+            pages = _render_pdf_pages(b, thin, len(parts))
+            for (i, _), t in zip(pages, _ocr_images([img for _, img in pages])):
+                parts[i] = t.strip() or parts[i]
+        except Exception:
+            pass  # OCR できなくてもテキスト層の分は使う
+    return "\n".join(t for t in parts if t).strip()
+
+def _ocr_images(imgs) -> List[str]:
+    """画像ごとの OCR 結果（複数枚は 1 プロセスでまとめ、ページ区切りの改ページ文字で分け直す）"""
+    import pytesseract
+    config = _tess_config()
+    if len(imgs) > 1:
+        try:
+            texts = _ocr_pages_batch(imgs, config=config).split("\f")
+            if texts and not texts[-1].strip():
+                texts.pop()  # 最終ページの後ろにも区切りが付く
+            if len(texts) == len(imgs):
+                return texts
+        except Exception:
+            pass
+    return [pytesseract.image_to_string(im, lang="jpn", config=config) for im in imgs]
+
 def ocr_pdf_bytes_to_text(b: bytes) -> str:
     try:
-        from pdf2image import convert_from_bytes
-        import pytesseract
-        pages = convert_from_bytes(b, dpi=300)
-        txt = "\n".join(pytesseract.image_to_string(p, lang="jpn") for p in pages)
-        return txt.strip()
+        txt = _ocr_pdf_at(b, OCR_DPI)
+        if len(txt) < 30:  # 低解像度で読めなかったときだけ高解像度で再挑戦
+            txt = _ocr_pdf_at(b, OCR_RETRY_DPI) or txt
+        return txt
     except Exception:
         return ""
 
+# PDF/画像の文字起こしは CPU を食うので別プロセスで並行実行する（tesseract もプロセスごとに独立）
+OCR_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+def _media_kind(url: str, ct: str) -> Optional[str]:
+    """本文の扱い: "html" / "pdf" / "image" / None（run_async の分岐と同じ優先順）"""
+    u = url.lower()
+    if "text/html" in ct:
+        return "html"
+    if "application/pdf" in ct or u.endswith(".pdf"):
+        return "pdf"
+    if any(ext in u for ext in (".jpg",".jpeg",".png")) or "image/" in ct:
+        return "image"
+    return None
+
+def _media_to_text(kind: str, body: bytes) -> str:
+    """ワーカープロセス側: PDF はテキスト層→薄ければ OCR、画像は OCR"""
+    if kind == "pdf":
+        # テキスト層の薄いページだけ OCR。それでもほぼ無文字なら従来どおり全ページを OCR
+        txt = _pdf_text_paged(body)
+        if txt is None:
+            txt = extract_text_from_pdf_bytes(body)
+        if len(txt) < 30:  # ほぼ無文字→OCR
+            txt = ocr_pdf_bytes_to_text(body)
+        return txt
+    return ocr_bytes_image_to_text(body)
+
+# ---------- HTML の文字コード ----------
+_CT_CHARSET_PAT   = re.compile(r"charset=[\"']?([\w\-]+)", re.I)
+_META_CHARSET_PAT = re.compile(rb"<meta[^>]+charset=[\"']?([\w\-]+)", re.I)
+
+# codecs が知らない／shift_jis に寄せてしまう Shift_JIS 系のラベル（WHATWG でも Shift_JIS = Windows-31J 扱い）
+_CHARSET_ALIASES = {"windows-31j": "cp932", "x-sjis": "cp932", "sjis": "cp932", "x-euc-jp": "euc_jp"}
+
+@functools.lru_cache(maxsize=64)
+def _codec_name(enc: str) -> str:
+    enc = _CHARSET_ALIASES.get(enc, enc)
+    try:
+        name = codecs.lookup(enc).name
+    except LookupError:
+        return "utf-8"
+    # 自治体サイトの Shift_JIS 宣言は実際には Windows 拡張文字（①・㈱ など）を含む cp932 が多い
+    return "cp932" if name == "shift_jis" else name
+
+def decode_html(body: bytes, ct: str) -> str:
+    """Content-Type の charset → 先頭 1024 バイトの <meta> の順で文字コードを決めて 1 回だけデコード（既定 utf-8）"""
+    m = _CT_CHARSET_PAT.search(ct)
+    if m:
+        enc = m.group(1)
+    else:
+        m = _META_CHARSET_PAT.search(body[:1024])
+        enc = m.group(1).decode("ascii") if m else "utf-8"
+    return body.decode(_codec_name(enc.lower()), errors="replace")
+
 # ---------- HTTP ----------
-def conditional_get(client: httpx.Client, url: str, st: Dict[str, Any]) -> Tuple[str, Optional[bytes], Dict[str,str]]:
+async def conditional_get(client: httpx.AsyncClient, url: str, st: Dict[str, Any]) -> Tuple[str, Optional[bytes], Dict[str,str], Optional[str]]:
+    """(ct, 変化した本文 or None, ヘッダ, 本文の sha1b) を返す。sha1 は state 更新でも使うのでここで 1 回だけ計算する"""
     headers = {"User-Agent": UA}
     if st.get("etag"): headers["If-None-Match"] = st["etag"]
     if st.get("last_modified"): headers["If-Modified-Since"] = st["last_modified"]
     try:
-        r = client.get(url, headers=headers, timeout=TIMEOUT, follow_redirects=True)
+        r = await client.get(url, headers=headers, follow_redirects=True)
     except Exception:
-        return "", None, {}
+        return "", None, {}, None
     if r.status_code == 304:
-        return ((r.headers.get("content-type") or "").lower(), None, dict(r.headers))
+        return ((r.headers.get("content-type") or "").lower(), None, dict(r.headers), None)
     ct = (r.headers.get("content-type") or "").lower()
     body = r.content
+    digest = sha1b(body)
     changed = False
     if r.headers.get("etag") and r.headers.get("etag") != st.get("etag"): changed = True
     elif r.headers.get("last-modified") and r.headers.get("last-modified") != st.get("last_modified"): changed = True
     elif str(len(body)) != str(st.get("length")): changed = True
-    elif sha1b(body) != st.get("sha1"): changed = True
-    return (ct, body if changed else None, dict(r.headers))
+    elif digest != st.get("sha1"): changed = True
+    return (ct, body if changed else None, dict(r.headers), digest)
 
 def make_event_id(pref: str, norm_name: str, source_url: str) -> str:
     return hashlib.sha1(f"{pref}|{norm_name}|{source_url}".encode("utf-8")).hexdigest()[:16]
 
-def merge_events(base, new_events, pref, source_url):
+def event_index(base) -> Dict[str, int]:
+    """base["events"] の id → 位置（merge_events に渡して呼び出しをまたいで使い回す）"""
+    return {e.get("id"): i for i, e in enumerate(base.setdefault("events", [])) if e.get("id")}
+
+def merge_events(base, new_events, pref, source_url, idx: Optional[Dict[str, int]] = None):
     base.setdefault("events", [])
-    idx = {e.get("id"): i for i, e in enumerate(base["events"]) if e.get("id")}
+    if idx is None:
+        idx = event_index(base)
+    start = len(base["events"])
     now = now_iso()
 
     for ev in new_events:
@@ -599,24 +949,87 @@ def merge_events(base, new_events, pref, source_url):
         else:
             base["events"].append(payload)
 
+    # 追加分は次の呼び出しから見えるようにする（同じ呼び出し内では従来どおり照合しない）
+    for i in range(start, len(base["events"])):
+        eid = base["events"][i].get("id")
+        if eid:
+            idx[eid] = i
     base["updated"] = now
     return base
 
 
 # ---------- 発見（リンク探索） ----------
-def discover_links(html: str, base_url: str, patterns: List[str], crawl: Dict[str, Any], auto: bool=False) -> List[str]:
-    doc = HTMLParser(html or "")
-    allow_re = [re.compile(p) for p in crawl.get("allow", [])]
-    deny_re  = [re.compile(p) for p in crawl.get("deny",  [])]
-    patt_re  = [re.compile(p) for p in (patterns or [])]
+@functools.lru_cache(maxsize=256)
+def _compile_all(patterns: Tuple[str, ...], flags: int = 0) -> Tuple["re.Pattern", ...]:
+    return tuple(re.compile(p, flags) for p in patterns)
+
+# Hyperscan があれば deny/allow/patterns/path_hints を 1 つの DB にまとめ、URL 1 本につき 1 回の走査で判定する
+try:
+    import hyperscan  # type: ignore
+except ImportError:
+    hyperscan = None
+
+_HS_DENY, _HS_ALLOW, _HS_PATT, _HS_HINT = 1, 2, 4, 8   # 一致したパターンの種類（ビット）
+
+@functools.lru_cache(maxsize=256)
+def _hs_db(allow: Tuple[str, ...], deny: Tuple[str, ...], patterns: Tuple[str, ...], hints: Tuple[str, ...]):
+    """Hyperscan の DB。モジュールが無い・Hyperscan で扱えない正規表現が混じるときは None（re で判定）"""
+    if hyperscan is None:
+        return None
+    base = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_ALLOWEMPTY | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    exprs, ids, flags = [], [], []
+    for cls, pats, fl in ((_HS_DENY, deny, 0), (_HS_ALLOW, allow, 0), (_HS_PATT, patterns, 0),
+                          (_HS_HINT, hints, hyperscan.HS_FLAG_CASELESS)):
+        for p in pats:
+            exprs.append(p.encode("utf-8")); ids.append(cls); flags.append(base | fl)
+    if not exprs:
+        return None
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    try:
+        db.compile(expressions=exprs, ids=ids, flags=flags)
+    except Exception:
+        return None
+    return db
+
+def _hs_classes(db, u: str) -> int:
+    hit = 0
+    def on_match(id_, start, end, flags, ctx):
+        nonlocal hit
+        hit |= id_
+    db.scan(u.encode("utf-8"), match_event_handler=on_match)
+    return hit
+
+def discover_links(html: str, base_url: str, patterns: List[str], crawl: Dict[str, Any], auto: bool=False,
+                   doc: Optional[HTMLParser] = None) -> List[str]:
+    if doc is None:
+        doc = HTMLParser(html or "")
+    # パターンはページごとにコンパイルし直さない（同じ機関の設定なら同じタプルが来る）
+    allow_src = tuple(crawl.get("allow", []))
+    deny_src  = tuple(crawl.get("deny",  []))
+    patt_src  = tuple(patterns or [])
+    hint_src  = tuple(crawl.get("path_hints") or PATH_HINTS_DEF)
+    allow_re = _compile_all(allow_src)
+    deny_re  = _compile_all(deny_src)
+    patt_re  = _compile_all(patt_src)
 
     kw = crawl.get("keywords") or KEYWORDS_DEF
-    hints = [re.compile(h, re.I) for h in (crawl.get("path_hints") or PATH_HINTS_DEF)]
+    hints = _compile_all(hint_src, re.I)
+    db = _hs_db(allow_src, deny_src, patt_src, hint_src)
 
     out: List[str] = []
     for a in doc.css("a[href]"):
         href = a.attributes.get("href") or ""
         u = _abs(base_url, href)
+        if db is not None:
+            c = _hs_classes(db, u)
+            if c & _HS_DENY:  # deny 先
+                continue
+            if allow_re and not c & _HS_ALLOW:
+                continue
+            if (patt_re and c & _HS_PATT) or (auto and (any(k in (a.text() or "") for k in kw) or c & _HS_HINT)):
+                out.append(u)
+            continue
+
         if deny_re and any(r.search(u) for r in deny_re):  # deny 先
             continue
         if allow_re and not any(r.search(u) for r in allow_re):
@@ -636,10 +1049,24 @@ def discover_links(html: str, base_url: str, patterns: List[str], crawl: Dict[st
     return out
 
 # ---------- メイン ----------
-def run(dry_run=False, full=False, save_html=False, save_pdf=False, limit: Optional[int]=None):
+FETCH_CONCURRENCY = 8   # 同時に取りに行く URL 数（同じ深さの URL をまとめて取得する）
+SNAPSHOT_WRITERS = 4    # ページ/PDF の保存はクロールを止めないよう別スレッドで
+
+def _write_bytes(p: Path, data: bytes, content_addressed: bool = False):
+    """content_addressed（名前＝中身のハッシュ）なら同じサイズのファイルが既にあれば書かない"""
+    if content_addressed:
+        try:
+            if p.stat().st_size == len(data):
+                return
+        except FileNotFoundError:
+            pass
+    p.write_bytes(data)
+
+async def run_async(dry_run=False, full=False, save_html=False, save_pdf=False, limit: Optional[int]=None):
     agencies = load_json(REG_FILE, [])
-    state = load_json(STATE_FILE, {})
+    state = load_state(STATE_FILE)
     out    = load_json(OUT_FILE, {"updated": now_iso(), "events": []})
+    out_idx = event_index(out)
 
     # 入口URL
     targets = []
@@ -663,132 +1090,191 @@ def run(dry_run=False, full=False, save_html=False, save_pdf=False, limit: Optio
     FILES_DIR.mkdir(parents=True, exist_ok=True)
 
     total_changes = 0
-    with httpx.Client(http2=True, headers={"User-Agent": UA}) as client:
-        for ti, t in enumerate(targets, 1):
-            ag   = t["agency"]
-            pref = t["pref"]
-            auto = bool(t.get("auto"))
-            domains   = ag.get("domains") or []
-            patterns  = ag.get("watch_patterns") or []
-            crawl     = ag.get("crawl") or {}
-            allow_def = [r"\.html?$", r"\.php(?:\?.*)?$", r"\.pdf$", r"\.jpe?g$", r"\.png$"]
-            if not crawl.get("allow"):
-                crawl["allow"] = allow_def
-            max_depth = int(crawl.get("max_depth", 1))
-            same_dom  = bool(crawl.get("same_domain", True))
-
-            # BFS キュー
-            queue: List[Tuple[str,int]] = [(t["url"], 0)]
-            seen: set[str] = set()
-
-            while queue:
-                url, depth = queue.pop(0)
-                if url in seen:
-                    continue
-                seen.add(url)
-
-                st = state.get(url, {})
-                print(f"[{ti}/{len(targets)}] d={depth}  {url}")
-
-                # 取得
-                if full:
-                    try:
-                        r = client.get(url, timeout=TIMEOUT, follow_redirects=True)
-                        ct = (r.headers.get("content-type") or "").lower()
-                        body = r.content
-                        hdr  = dict(r.headers)
-                    except Exception:
-                        continue
-                else:
-                    ct, body, hdr = conditional_get(client, url, st)
-
-                if body is None:
-                    print("  └ unchanged")
-                    continue
-
-                # スナップショット
-                hname = hashlib.sha1(url.encode()).hexdigest()[:10]
-                if save_html and "text/html" in ct:
-                    (PAGES_DIR / f"{hname}.html").write_bytes(body)
-                if save_pdf and "application/pdf" in ct:
-                    (PAGES_DIR / f"{hname}.pdf").write_bytes(body)
-
-                events: List[Dict[str,Any]] = []
-                more_links: List[str] = []
-
-                # HTML
-                if "text/html" in ct:
-                    try:
-                        html = body.decode("utf-8", "ignore")
-                    except Exception:
-                        html = body.decode("cp932", "ignore")
-
-                    host = urllib.parse.urlparse(url).netloc
-                    if host in YAMANASHI_HOSTS:
-                        if url.lower().endswith(".pdf"):
-                            events = []  # 山梨のPDFは無視
-                        elif host.endswith("pref.yamanashi.jp") and "/rindoujyouhou/kisei.php" in url:
-                            events = parse_yamanashi_kisai(html, url, now_iso())
-                        else:
-                            links = parse_yamanashi_list(html, url, now_iso())
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(client: httpx.AsyncClient, url: str):
+        """(ct, body, hdr, sha1) を返す。--full で取得失敗なら None（そのURLは飛ばす）"""
+        async with sem:
+            if full:
+                try:
+                    r = await client.get(url, follow_redirects=True)
+                except Exception:
+                    return None
+                return ((r.headers.get("content-type") or "").lower(), r.content, dict(r.headers), sha1b(r.content))
+            return await conditional_get(client, url, state.get(url, {}))
+
+    pool: Optional[concurrent.futures.ProcessPoolExecutor] = None  # PDF/画像が来たときに初めて起動
+    writer = concurrent.futures.ThreadPoolExecutor(max_workers=SNAPSHOT_WRITERS)  # スナップショット書き込み用
+    pdf_saved: set = set()
+    # FILES_DIR の PDF は中身のハッシュ名で共有するので、state から何 URL が指しているかを数える
+    file_refs = collections.Counter(st["file"] for st in state.values() if st.get("file"))
+    stale_files: set = set()  # 参照が 0 になった PDF（書き込みが終わってから消す）
+
+    async def media_texts(items: List[Tuple[str, bytes]]) -> List[str]:
+        nonlocal pool
+        if not items:
+            return []
+        if OCR_WORKERS <= 1:
+            return [_media_to_text(k, b) for k, b in items]
+        if pool is None:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=OCR_WORKERS)
+        loop = asyncio.get_running_loop()
+        return list(await asyncio.gather(*(loop.run_in_executor(pool, _media_to_text, k, b) for k, b in items)))
+
+    # transport を渡すと Client 側の http2/limits は使われないので、トランスポートに持たせる
+    transport = httpx.AsyncHTTPTransport(http2=True, limits=HTTP_LIMITS, retries=HTTP_RETRIES)
+    try:
+        async with httpx.AsyncClient(headers={"User-Agent": UA}, timeout=HTTP_TIMEOUT, transport=transport) as client:
+            for ti, t in enumerate(targets, 1):
+                ag   = t["agency"]
+                pref = t["pref"]
+                auto = bool(t.get("auto"))
+                domains   = ag.get("domains") or []
+                patterns  = ag.get("watch_patterns") or []
+                crawl     = ag.get("crawl") or {}
+                allow_def = [r"\.html?$", r"\.php(?:\?.*)?$", r"\.pdf$", r"\.jpe?g$", r"\.png$"]
+                if not crawl.get("allow"):
+                    crawl["allow"] = allow_def
+                max_depth = int(crawl.get("max_depth", 1))
+                same_dom  = bool(crawl.get("same_domain", True))
+
+                # BFS キュー
+                queue: collections.deque[Tuple[str,int]] = collections.deque([(t["url"], 0)])
+                seen: set[str] = set()
+
+                while queue:
+                    # 同じ深さの URL をまとめて並行取得し、処理（抽出・state/out 更新）は元の順に 1 件ずつ
+                    depth = queue[0][1]
+                    wave: List[str] = []
+                    while queue and queue[0][1] == depth:
+                        url, _ = queue.popleft()
+                        if url in seen:
+                            continue
+                        seen.add(url)
+                        wave.append(url)
+                    results = await asyncio.gather(*(fetch(client, u) for u in wave))
+
+                    # この深さの PDF/画像はまとめてワーカーへ投げ、結果は URL ごとに引く
+                    kinds = [_media_kind(u, res[0]) if res and res[1] is not None else None
+                             for u, res in zip(wave, results)]
+                    media = [(i, k) for i, k in enumerate(kinds) if k in ("pdf", "image")]
+                    texts = dict(zip((i for i, _ in media),
+                                     await media_texts([(k, results[i][1]) for i, k in media])))
+
+                    for wi, (url, res) in enumerate(zip(wave, results)):
+                        print(f"[{ti}/{len(targets)}] d={depth}  {url}")
+                        if res is None:
+                            continue
+                        ct, body, hdr, body_sha1 = res
+
+                        if body is None:
+                            print("  └ unchanged")
+                            continue
+
+                        # スナップショット
+                        hname = hashlib.sha1(url.encode()).hexdigest()[:10]
+                        if save_html and "text/html" in ct:
+                            writer.submit(_write_bytes, PAGES_DIR / f"{hname}.html", body)
+                        if save_pdf and "application/pdf" in ct:
+                            writer.submit(_write_bytes, PAGES_DIR / f"{hname}.pdf", body)
+
+                        events: List[Dict[str,Any]] = []
+                        more_links: List[str] = []
+
+                        kind = kinds[wi]
+                        saved_file: Optional[str] = None
+
+                        # HTML
+                        if kind == "html":
+                            html = decode_html(body, ct)
+                            doc = HTMLParser(html)  # このページの DOM は 1 回だけ作って使い回す
+
+                            host = _netloc_of(url)
+                            if host in YAMANASHI_HOSTS:
+                                if url.lower().endswith(".pdf"):
+                                    events = []  # 山梨のPDFは無視
+                                elif host.endswith("pref.yamanashi.jp") and "/rindoujyouhou/kisei.php" in url:
+                                    events = parse_yamanashi_kisai(html, url, now_iso())
+                                else:
+                                    links = parse_yamanashi_list(html, url, now_iso(), doc=doc)
+                                    if depth < max_depth:
+                                        for it in links:
+                                            u2 = it.get("url")
+                                            if u2 and u2 not in seen:
+                                                more_links.append(u2)
+                                    events = []  # 一覧からはイベントを作らない
+                            else:
+                                events = harvest_from_html(html, doc=doc)
+
+                            if not events:  # フォールバック
+                                text = doc.text(separator="\n")
+                                events = extract_generic_jp(text, base_url=canonical_url(url), pref=pref)
+
+                            # 次URL enqueue
                             if depth < max_depth:
-                                for it in links:
-                                    u2 = it.get("url")
-                                    if u2 and u2 not in seen:
+                                cand = discover_links(html, url, patterns, crawl, auto=auto, doc=doc)
+                                for u2 in cand:
+                                    if same_dom and not _same_domain(u2, domains):
+                                        continue
+                                    if u2 not in seen:
                                         more_links.append(u2)
-                            events = []  # 一覧からはイベントを作らない
-                    else:
-                        events = harvest_from_html(html)
-
-                    if not events:  # フォールバック
-                        text = HTMLParser(html).text(separator="\n")
-                        events = extract_generic_jp(text, base_url=canonical_url(url), pref=pref)
-
-                    # 次URL enqueue
-                    if depth < max_depth:
-                        cand = discover_links(html, url, patterns, crawl, auto=auto)
-                        for u2 in cand:
-                            if same_dom and not _same_domain(u2, domains):
-                                continue
-                            if u2 not in seen:
-                                more_links.append(u2)
-
-                # PDF
-                elif "application/pdf" in ct or url.lower().endswith(".pdf"):
-                    url = canonical_url(url)
-                    save_to = FILES_DIR / (hashlib.sha1(url.encode()).hexdigest()[:16] + ".pdf")
-                    save_to.write_bytes(body)
-                    txt = extract_text_from_pdf_bytes(body)
-                    if len(txt) < 30:  # ほぼ無文字→OCR
-                        txt = ocr_pdf_bytes_to_text(body)
-                    events = extract_generic_jp(txt, base_url=url, pref=pref)
-
-                # 画像
-                elif any(ext in url.lower() for ext in (".jpg",".jpeg",".png")) or "image/" in ct:
-                    txt = ocr_bytes_image_to_text(body)
-                    events = extract_generic_jp(txt, base_url=canonical_url(url), pref=pref)
-
-                else:
-                    print("  └ unsupported content-type:", ct)
-
-                print(f"  └ extracted {len(events)} events")
-                if events and not dry_run:
-                    out = merge_events(out, events, pref=pref, source_url=url)
-                    total_changes += 1
-
-                # state 更新
-                state[url] = {"etag": hdr.get("etag"),
-                              "last_modified": hdr.get("last-modified"),
-                              "length": len(body), "sha1": sha1b(body),
-                              "checked_at": now_iso()}
-
-                # 次URL enqueue
-                for u2 in more_links:
-                    queue.append((u2, depth+1))
+
+                        # PDF
+                        elif kind == "pdf":
+                            url = canonical_url(url)
+                            # 中身のハッシュで名前を付ける（同じ PDF を複数の機関・URL が載せていても 1 つだけ）
+                            saved_file = base64.b64decode(body_sha1).hex()[:16] + ".pdf"
+                            save_to = FILES_DIR / saved_file
+                            if save_to not in pdf_saved:
+                                pdf_saved.add(save_to)
+                                writer.submit(_write_bytes, save_to, body, True)
+                            events = extract_generic_jp(texts[wi], base_url=url, pref=pref)
+
+                        # 画像
+                        elif kind == "image":
+                            events = extract_generic_jp(texts[wi], base_url=canonical_url(url), pref=pref)
+
+                        else:
+                            print("  └ unsupported content-type:", ct)
+
+                        print(f"  └ extracted {len(events)} events")
+                        if events and not dry_run:
+                            out = merge_events(out, events, pref=pref, source_url=url, idx=out_idx)
+                            total_changes += 1
+
+                        # state 更新
+                        prev_file = state.get(url, {}).get("file")
+                        state[url] = {"etag": hdr.get("etag"),
+                                      "last_modified": hdr.get("last-modified"),
+                                      "length": len(body), "sha1": body_sha1,
+                                      "checked_at": now_iso(), "file": saved_file}
+                        if prev_file != saved_file:
+                            if saved_file:
+                                file_refs[saved_file] += 1
+                            if prev_file:
+                                file_refs[prev_file] -= 1
+                                if file_refs[prev_file] <= 0:
+                                    stale_files.add(prev_file)
+
+                        # 次URL enqueue
+                        for u2 in more_links:
+                            queue.append((u2, depth+1))
+    finally:
+        # 途中で例外になっても、投げたスナップショット書き込みを待ち、OCR のプロセスも止めてから抜ける
+        if pool is not None:
+            pool.shutdown()
+        writer.shutdown(wait=True)  # スナップショットを書き切ってから state を保存
 
     if not dry_run and total_changes:
         save_json(OUT_FILE, out); print("wrote:", OUT_FILE)
-    save_json(STATE_FILE, state); print("state:", STATE_FILE, "(updated)")
+    save_state(STATE_FILE, state); print("state:", STATE_FILE, "(updated)")
+    # 新しい版に置き換わり、どの URL からも指されなくなった PDF は state を保存してから消す
+    for name in stale_files:
+        if file_refs[name] <= 0:
+            (FILES_DIR / name).unlink(missing_ok=True)
+
+def run(dry_run=False, full=False, save_html=False, save_pdf=False, limit: Optional[int]=None):
+    asyncio.run(run_async(dry_run=dry_run, full=full, save_html=save_html, save_pdf=save_pdf, limit=limit))
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
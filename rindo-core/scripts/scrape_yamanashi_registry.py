@@ -1,13 +1,60 @@
 # scripts/scrape_yamanashi_registry.py
-import re, json, unicodedata, time, html, datetime
+import asyncio, re, os, json, codecs, random, hashlib, unicodedata, html, datetime
+from email.utils import parsedate_to_datetime
+from collections import defaultdict
 from html import unescape
 from urllib.parse import urljoin, urlparse, parse_qs
 import httpx
-from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 BASE = "https://www.pref.yamanashi.jp/rindoujyouhou/"
 LIST_URL = urljoin(BASE, "list.php")
 OUT = "data/out/yamanashi_registry.json"
+# id → {etag, last_modified, hash, fields, year}（次回の条件付き GET 用）。
+# data/out は sync_view_data.py で view に丸ごと公開されるので、内部用のキャッシュはその外に置く
+CACHE_FILE = "data/cache/yamanashi_registry.cache.json"
+DETAIL_CONCURRENCY = 8   # 詳細ページを同時に取りに行く数
+HOST_RATE = 4.0          # 1 ホストあたり毎秒のリクエスト開始数（固定の sleep の代わり）
+RETRY_MAX = 4            # 429/503・通信エラー時の試行回数（初回を含む）
+RETRY_STATUS = (429, 503)
+RETRY_WAIT_MAX = 30.0    # 1 回の待ちの上限（秒）
+
+# 正規表現はモジュール読み込み時に 1 回だけコンパイル
+_RE_BRACKET = re.compile(r"[【［\[\{〔].*?[】］\]\}〕]")
+_RE_PAREN   = re.compile(r"[（(].*?[)）]")
+_RE_WS      = re.compile(r"\s+")
+_RE_OWNER   = re.compile(r"(県営|市営|町営|村営)")
+
+# 1 文字単位の置換・削除は str.translate で 1 パスに（空白は \s と同じ集合）
+_WS_CHARS = "".join(c for c in map(chr, range(0x3001)) if c.isspace())  # 空白は U+3000 までにしか無い
+_WS_TABLE = str.maketrans("", "", _WS_CHARS)
+# 仕上げ: 記号・空白の削除と ヶ/ヵ のゆらぎ。－/―/– は元々 "-" にしてから消していたので直接消す
+_FINAL_TABLE = str.maketrans({**dict.fromkeys("（）()・･‐-—―ｰ　－–" + _WS_CHARS), "ヶ": "ケ", "ヵ": "カ"})
+
+# 詳細ページの status/日付/理由/更新日 を 1 回の走査でまとめて拾う。
+# 各候補は先読み (?=...) の中に置いて文字を消費しない → 位置ごとに全種類を試すので、
+# 種類ごとに別々に search/findall していたときと同じ箇所が見つかる（更新日の日付も期間の候補になる）
+# 先頭の文字クラスは各候補の 1 文字目の集合で、候補になり得ない位置を分岐に入る前に飛ばす
+_RE_FIELDS = re.compile(
+    r"(?=[通全車規片時重幅迂チ一解開\d令R崩落土路倒凍工冠災台雪地豪最更掲])"
+    r"(?=(?P<closed>通行止|全面?通行止|車両通行止)"
+    r"|(?P<regulated>規制|片側交互|時間規制|重量|幅員|迂回|チェーン|一部)"
+    r"|(?P<open>解除|開通|通行可)"
+    r"|(?P<date>(?P<y>20\d{2}|令和\d+|R\d+)?(?P<m>\d{1,2})月(?P<d>\d{1,2})日)"
+    r"|(?P<reason>崩落|落石|土砂崩れ|路肩|路面|倒木|凍結|工事|冠水|災害|台風|雪崩|地震|豪雨)"
+    r"|(?P<updated>(?:最終更新日|更新日|掲載日).{0,10}?(?P<uy>\d{4})年(?P<um>\d{1,2})月(?P<ud>\d{1,2})日))"
+)
+_RE_NONDIGIT = re.compile(r"\D+")
+_RE_QS_ID   = re.compile(r"(?:^|&)id=([^&]+)")
+# 一覧ページの <a href="…kisei.php?id=…">名前</a>（中にタグが無い素直な形だけ）を UTF-8 の bytes から直接
+_RE_LIST_LINK = re.compile(rb'(?i:<a)\s(?:([^>]*?)\s)?(?i:href)="([^"]*kisei\.php\?id=[^"]*)"[^>]*>([^<]*)</(?i:a)>')
+_RE_LIST_SKIP = re.compile(rb"<!--.*?-->|<(?i:script|style)\b.*?</(?i:script|style)\s*>", re.S)
 
 def _norm_name(s: str) -> str:
     if not s:
@@ -15,101 +62,250 @@ def _norm_name(s: str) -> str:
     s = unescape(s)
     s = unicodedata.normalize("NFKC", s)
     # 【フリガナ】や各種角括弧内を除去
-    s = re.sub(r"[【［\[\{〔].*?[】］\]\}〕]", "", s)
+    s = _RE_BRACKET.sub("", s)
     # () の括弧内も除去
-    s = re.sub(r"[（(].*?[)）]", "", s)
-    # 空白・記号の統一
-    s = re.sub(r"\s+", "", s)
-    s = s.replace("－","-").replace("―","-").replace("–","-")
-    # ヶ/ヵのゆらぎ
-    s = s.replace("ヶ","ケ").replace("ヵ","カ")
+    s = _RE_PAREN.sub("", s)
+    # 空白を先に落とす（「林 道」なども下の語の除去に掛かるように）
+    s = s.translate(_WS_TABLE)
     # ノイズ除去
-    s = re.sub(r"(森林管理道)", "", s)
-    s = re.sub(r"(県営|市営|町営|村営)", "", s)
-    s = re.sub(r"(本線|幹線)$", "", s)
-    s = re.sub(r"(支線?)$", "", s)  # “支”単独も落とす
+    s = s.replace("森林管理道", "")
+    s = _RE_OWNER.sub("", s)
+    if s.endswith(("本線", "幹線")):
+        s = s[:-2]
+    if s.endswith("支線"):  # “支”単独も落とす
+        s = s[:-2]
+    elif s.endswith("支"):
+        s = s[:-1]
     s = s.replace("林道","").replace("線","")
-    # 仕上げ
-    s = re.sub(r"[（）()・･‐\-—―ｰ\s　]", "", s)
+    # 仕上げ（記号・空白の削除と ヶ/ヵ のゆらぎ）
+    s = s.translate(_FINAL_TABLE)
     return s
 
 # ---- 県ページから規制情報を抽出 -------------------------------------------
 
-def _status_from_text(t: str) -> str:
-    """本文テキストから status を推定（closed > regulated > open）"""
-    if re.search(r"通行止|全面?通行止|車両通行止", t):
-        return "closed"
-    if re.search(r"規制|片側交互|時間規制|重量|幅員|迂回|チェーン|一部", t):
-        return "regulated"
-    if re.search(r"解除|開通|通行可", t):
-        return "open"
-    return ""  # 不明
-
 def _era_year(ystr: str) -> int:
     """令和/R を西暦に（R1=2019）"""
     if not ystr:
         return datetime.date.today().year
     if ystr.startswith(("令和", "R", "r")):
-        n = int(re.sub(r"\D+", "", ystr))
-        return 2018 + n
+        # 日付の正規表現から来る「令和7」「R7」は接頭辞を切れば数字だけなので、そのまま int に
+        n = ystr[2:] if ystr[0] == "令" else ystr[1:]
+        if not n.isdecimal():
+            n = _RE_NONDIGIT.sub("", ystr)
+        return 2018 + int(n)
     return int(ystr)
 
-def _pick_dates(t: str):
+def _text_fields(t: str) -> dict:
     """
-    ざっくり期間抽出： [年]月日 ～ [年]月日 / “当分の間”は reg_to空
-    返り値: (reg_from, reg_to)
+    本文テキストから status（closed > regulated > open）/ 期間 / 理由 / 更新日 を推定。
+    期間はざっくり [年]月日 の先頭 2 つを reg_from/reg_to に（“当分の間”などは reg_to 空）
     """
-    t = t.replace("〜","~").replace("－","-")
+    st = ""
+    dates = []        # (年, 月, 日) 最大 2 件。重ならないものだけ（findall と同じ）
+    date_end = 0
+    reason = ""
+    updated = None
+    for m in _RE_FIELDS.finditer(t):
+        g = m.lastgroup
+        if g == "date":
+            if len(dates) < 2 and m.start() >= date_end:
+                dates.append(m.group("y", "m", "d"))
+                date_end = m.end("date")
+        elif g == "reason":
+            if not reason:
+                reason = m.group(g)
+        elif g == "updated":
+            if updated is None:
+                updated = m.group("uy", "um", "ud")
+        elif g == "closed" or (st != "closed" and (g == "regulated" or not st)):
+            st = g
+        if st == "closed" and len(dates) == 2 and reason and updated:
+            break
+
+    out = {}
+    if st:
+        out["status"] = st
     # 2025年9月28日 / 令和7年9月28日 / R7.9.28 / 9月28日
-    y = r"(20\d{2}|令和\d+|R\d+)?"
-    d = r"(\d{1,2})月(\d{1,2})日"
-    m = re.findall(y + d, t)
-    reg_from = reg_to = ""
-    if m:
-        y1, m1, d1 = m[0]
-        reg_from = f"{_era_year(y1):04d}-{int(m1):02d}-{int(d1):02d}"
-        if len(m) >= 2:
-            y2, m2, d2 = m[1]
-            reg_to   = f"{_era_year(y2):04d}-{int(m2):02d}-{int(d2):02d}"
-    if not reg_to and re.search(r"当分の間|未定", t):
-        reg_to = ""
-    return reg_from, reg_to
-
-def _pick_reason(t: str) -> str:
-    m = re.search(r"(崩落|落石|土砂崩れ|路肩|路面|倒木|凍結|工事|冠水|災害|台風|雪崩|地震|豪雨)", t)
-    return m.group(1) if m else ""
-
-def _pick_updated(t: str) -> str:
-    m = re.search(r"(最終更新日|更新日|掲載日).{0,10}?(\d{4})年(\d{1,2})月(\d{1,2})日", t)
-    if not m:
-        return ""
-    y, mo, da = int(m.group(2)), int(m.group(3)), int(m.group(4))
-    return f"{y:04d}-{mo:02d}-{da:02d}"
+    for key, (y, mo, da) in zip(("reg_from", "reg_to"), dates):
+        out[key] = f"{_era_year(y):04d}-{int(mo):02d}-{int(da):02d}"
+    if reason:
+        out["reg_reason"] = reason
+    if updated:
+        y, mo, da = map(int, updated)
+        out["updated_at"] = f"{y:04d}-{mo:02d}-{da:02d}"
+    return out
+
+class _TextTarget:
+    """パーサのイベントを受けてテキストノードだけを文書順に集める（木は作らない）"""
+    def __init__(self):
+        self.parts = []  # テキストノード単位
+        self.cur = []    # 今のテキストノードの断片（data は途中で分割されて来ることがある）
+        self.skip = 0    # script/style の中にいる深さ
+
+    def _flush(self):
+        if self.cur:
+            self.parts.append("".join(self.cur))
+            self.cur = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in ("script", "style"):
+            self.skip += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag in ("script", "style"):
+            self.skip -= 1
+
+    def data(self, data):
+        if not self.skip:
+            self.cur.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.parts
+
+def _query_id(url: str) -> str:
+    """URL の id クエリ値（parse_qs(urlparse(url).query)["id"][0] と同じ。空値は無視）"""
+    q = url.partition("#")[0].partition("?")[2]
+    if "%" in q or "\t" in url or "\r" in url or "\n" in url:
+        # %エンコードや urlsplit が取り除く制御文字があるときだけ標準ライブラリに任せる
+        return (parse_qs(urlparse(url).query).get("id") or [""])[0]
+    m = _RE_QS_ID.search(q)
+    return m.group(1).replace("+", " ") if m else ""
+
+def _page_text(html_doc: str | bytes, encoding: str | None = None) -> str:
+    # 詳細ページは本文テキストしか使わないので、DOM を作らずパーサのイベントから直接集める
+    # 表の列や段落テキストをまとめて検索できるようにスペース区切りへ（script/style・コメントは除く）
+    parser = lxml.etree.HTMLParser(target=_TextTarget(), encoding=encoding)
+    parts = lxml.etree.fromstring(html_doc, parser)
+    return _RE_WS.sub(" ", " ".join(parts))
 
-def _fetch_text(c: httpx.Client, url: str) -> str:
-    r = c.get(url, headers={"User-Agent":"Mozilla/5.0"})
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-    # 表の列や段落テキストをまとめて検索できるようにスペース区切りへ
-    return re.sub(r"\s+", " ", soup.get_text(separator=" "))
+def _html_input(r: httpx.Response) -> tuple[str | bytes, str | None]:
+    """
+    lxml に渡す本文と encoding。文字コードは r.text と同じ（ヘッダの charset、無ければ UTF-8）。
+    UTF-8 なら bytes のまま渡して str へのデコード・コピーを省く。Shift_JIS 等は libxml2 が
+    不正バイト（cp932 の拡張文字など）でそこから先を読まなくなるので、従来どおり httpx で str に
+    """
+    enc = r.encoding or "utf-8"
+    if codecs.lookup(enc).name == "utf-8":
+        return r.content, "utf-8"
+    return r.text, None
+
+def _list_links(body: bytes) -> list[tuple[str, str]] | None:
+    """
+    一覧ページ（UTF-8 の bytes）から (リンク文字列, href) を正規表現だけで拾う。
+    「kisei.php?id」の出現がすべて素直な <a> で拾えたときだけ結果を返し、それ以外
+    （中にタグがある・引用符が違う・コメントや script の中にある等）は None → lxml で解析する
+    """
+    found = list(_RE_LIST_LINK.finditer(body))
+    if not found or len(found) != body.count(b"kisei.php?id"):
+        return None
+    skip = [m.span() for m in _RE_LIST_SKIP.finditer(body)]
+    if any(s <= m.start() < e for m in found for s, e in skip):
+        return None
+    if b"\r" in body or b"\0" in body:  # 改行・NUL の置き換えは lxml に任せる
+        return None
+    if any(m.group(1) and b"href" in m.group(1).lower() for m in found):  # href が 2 つ（lxml は先の方）
+        return None
+    return [(unescape(m.group(3).decode("utf-8", "replace")).strip(),
+             unescape(m.group(2).decode("utf-8", "replace"))) for m in found]
+
+def _detail_fields(html_doc: str | bytes, encoding: str | None = None) -> dict:
+    """詳細ページ 1 枚から status/期間/理由/更新日 を取り出す（見つかったものだけ入れる）"""
+    return _text_fields(_page_text(html_doc, encoding))
+
+class _HostLimiter:
+    """ホストごとにリクエストの開始を 1/rate 秒以上あける（イベントループ 1 本なのでロック不要）"""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next = {}  # host -> 次に開始してよい loop.time()
+
+    async def wait(self, host: str):
+        now = asyncio.get_running_loop().time()
+        t = max(now, self.next.get(host, now))
+        self.next[host] = t + self.interval
+        if t > now:
+            await asyncio.sleep(t - now)
+
+def _retry_after(v) -> float | None:
+    """Retry-After（秒 または HTTP-date）を待ち秒数に"""
+    if not v:
+        return None
+    v = v.strip()
+    if v.isdigit():
+        return float(v)
+    try:
+        dt = parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (dt - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+async def _get(c: httpx.AsyncClient, limiter: _HostLimiter, url: str, headers=None) -> httpx.Response:
+    """レート制限つき GET。429/503 と通信エラーは指数バックオフ（Retry-After があればそれに従う）で再試行"""
+    host = urlparse(url).netloc
+    for attempt in range(RETRY_MAX):
+        last = attempt == RETRY_MAX - 1
+        await limiter.wait(host)
+        try:
+            r = await c.get(url, headers=headers)
+        except httpx.TransportError:
+            if last:
+                raise
+            wait = None
+        else:
+            if r.status_code not in RETRY_STATUS or last:
+                if r.status_code != 304:  # 条件付き GET の「変化なし」は呼び出し側で扱う
+                    r.raise_for_status()
+                return r
+            wait = _retry_after(r.headers.get("Retry-After"))
+        if wait is None:
+            wait = 2 ** attempt + random.uniform(0, 0.5)
+        await asyncio.sleep(min(RETRY_WAIT_MAX, wait))
+
+def _load_cache(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _save_cache(path: str, cache: dict):
+    # 途中で落ちても前回のキャッシュが壊れないよう .tmp に書いてから置き換える
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
 
 # --------------------------------------------------------------------------
 
-def main():
-    with httpx.Client(follow_redirects=True, timeout=20.0) as c:
-        r = c.get(LIST_URL)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+async def main_async():
+    # HTTP/2 なら詳細ページの取得は 1 本の接続に多重化される（h2 が必要）。UA はクライアントに 1 回だけ
+    limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    async with httpx.AsyncClient(http2=True, follow_redirects=True, timeout=20.0, limits=limits,
+                                 headers={"User-Agent":"Mozilla/5.0"}) as c:
+        limiter = _HostLimiter(HOST_RATE)
+        r = await _get(c, limiter, LIST_URL)
+        body, enc = _html_input(r)
 
         # テーブルの「林道名」列から <a href="kisei.php?id=...">名</a> を拾う
+        # 素直なリンクだけの一覧なら木を作らず正規表現で済ませる
+        links = _list_links(body) if isinstance(body, bytes) else None
+        if links is None:
+            doc = lxml.html.fromstring(body, parser=lxml.html.HTMLParser(encoding=enc))
+            links = [((a.text_content() or "").strip(), a.get("href") or "")
+                     for a in doc.xpath('//a[contains(@href, "kisei.php?id=")]')]
         rows = []  # [{id, name, norm, url, ...（後でstatus等を付与）}]
-        for a in soup.select('a[href*="kisei.php?id="]'):
-            name = (a.get_text() or "").strip()
-            href = a.get("href") or ""
+        for name, href in links:
             url = urljoin(BASE, href)
-            # id 抜き出し
-            q = parse_qs(urlparse(url).query)
-            _id = (q.get("id") or [""])[0]
+            _id = _query_id(url)
             if not _id:
                 continue
             norm = _norm_name(name)
@@ -118,33 +314,72 @@ def main():
             rows.append({"id": _id, "name": name, "norm": norm, "url": url})
 
         # --- 各路線の詳細ページをクロールして status/期間/理由/更新日 を採取 ---
-        for row in rows:
+        # 同時取得数を絞って並行に。row は各自の dict を書き換えるだけなので順序は rows のまま
+        # 解析（パース＋抽出）はスレッドへ回し、その間もイベントループは他の取得を進める
+        # 前回の ETag/Last-Modified で条件付き GET し、304 や本文が同じときは前回の抽出結果を使う
+        sem = asyncio.Semaphore(DETAIL_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        # 年の無い日付は取得した年で補っているので、年が変わったら前回の抽出結果は使わない
+        year = datetime.date.today().year
+        cache = {k: v for k, v in _load_cache(CACHE_FILE).items() if v.get("year") == year}
+        new_cache = {}
+        failed = 0
+
+        async def process(row):
+            nonlocal failed
+            ent = cache.get(row["id"]) or {}
+            headers = {}
+            if ent.get("etag"): headers["If-None-Match"] = ent["etag"]
+            if ent.get("last_modified"): headers["If-Modified-Since"] = ent["last_modified"]
             try:
-                time.sleep(0.25)  # 優しめに
-                txt = _fetch_text(c, row["url"])
-                st = _status_from_text(txt)
-                if st:
-                    row["status"] = st
-                fr, to = _pick_dates(txt)
-                if fr: row["reg_from"] = fr
-                if to: row["reg_to"] = to
-                rsn = _pick_reason(txt)
-                if rsn: row["reg_reason"] = rsn
-                upd = _pick_updated(txt)
-                if upd: row["updated_at"] = upd
+                # 同時数の枠（とレート制限の待ち）は取得の間だけ。解析中は枠を空けて次の取得を進める
+                async with sem:
+                    r = await _get(c, limiter, row["url"], headers=headers)
+                if r.status_code == 304:
+                    fields = ent["fields"]
+                    digest = ent.get("hash")
+                else:
+                    digest = hashlib.blake2b(r.content, digest_size=16).hexdigest()
+                    if digest == ent.get("hash"):
+                        fields = ent["fields"]
+                    else:
+                        fields = await loop.run_in_executor(None, _detail_fields, *_html_input(r))
+                row.update(fields)
+                new_cache[row["id"]] = {
+                    "etag": r.headers.get("etag") or ent.get("etag"),
+                    "last_modified": r.headers.get("last-modified") or ent.get("last_modified"),
+                    "hash": digest,
+                    "fields": fields,
+                    "year": year,
+                }
             except Exception:
-                # 失敗は無視して URL だけ残す
-                pass
+                # 再試行しても駄目なものは URL だけ残す（キャッシュは次回のために持ち越す）
+                failed += 1
+                if ent:
+                    new_cache[row["id"]] = ent
+
+        await asyncio.gather(*(process(row) for row in rows))
+        if failed:
+            print(f"[YAMANASHI] detail fetch failed: {failed}/{len(rows)}")
+        _save_cache(CACHE_FILE, new_cache)
 
     # 同一normは配列で保持
-    by_norm = {}
+    by_norm = defaultdict(list)
     for row in rows:
-        by_norm.setdefault(row["norm"], []).append(row)
+        by_norm[row["norm"]].append(row)
 
-    out = {"source": LIST_URL, "generated": True, "by_norm": by_norm}
-    with open(OUT, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    out = {"source": LIST_URL, "generated": True, "by_norm": dict(by_norm)}
+    # 読むのはスクリプトだけ。orjson があれば C 実装で整形付き、無ければ整形を省いて詰めて書く
+    if orjson is not None:
+        with open(OUT, "wb") as f:
+            f.write(orjson.dumps(out, option=orjson.OPT_INDENT_2))
+    else:
+        with open(OUT, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
     print(f"[YAMANASHI] registry written: {OUT} (keys={len(by_norm)})")
 
+def main():
+    asyncio.run(main_async())
+
 if __name__ == "__main__":
     main()
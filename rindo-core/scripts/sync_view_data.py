@@ -1,11 +1,47 @@
 # scripts/sync_view_data.py
-import os, shutil, filecmp, pathlib
+import os, shutil, filecmp, hashlib, pathlib
+from concurrent.futures import ThreadPoolExecutor
 SRC=pathlib.Path("data/out"); DST=pathlib.Path("view/data/out")
+SYNC_WORKERS = 8  # ファイルごとに独立した I/O なのでスレッドで並べる
 DST.mkdir(parents=True, exist_ok=True)
-for p in SRC.glob("*"):
-    if p.is_dir(): 
-        continue
+
+def _digest(p):
+    with open(p, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").digest()
+
+def _same(p, q, sp, sq):
+    if sp.st_size != sq.st_size:
+        return False
+    # コピー時に mtime も揃えているので、サイズ＋mtime が同じなら中身は読まない
+    if sp.st_mtime == sq.st_mtime:
+        return True
+    if not hasattr(hashlib, "file_digest"):  # Py3.10 以前
+        return filecmp.cmp(str(p), str(q), shallow=False)
+    return _digest(p) == _digest(q)
+
+def _sync_one(p):
+    """必要なら p を DST へコピーし、コピーしたかどうかを返す"""
     q = DST/p.name
-    if not q.exists() or not filecmp.cmp(str(p), str(q), shallow=False):
-        shutil.copy2(p, q); print("updated:", p.name)
+    sp = p.stat()
+    try:
+        sq = q.stat()
+    except FileNotFoundError:
+        sq = None
+    if sq is not None and _same(p, q, sp, sq):
+        if sp.st_mtime != sq.st_mtime:  # 中身は同じ → 時刻だけ揃えて次回は読まずに済ませる
+            os.utime(q, ns=(sp.st_atime_ns, sp.st_mtime_ns))
+        return False
+    # 配信用に中身が揃えばよいので copy2（権限・xattr も写す）ではなく copyfile＋時刻だけ
+    # （Linux では copyfile はカーネル内コピー sendfile を使う）
+    shutil.copyfile(p, q)
+    os.utime(q, ns=(sp.st_atime_ns, sp.st_mtime_ns))
+    return True
+
+# *.cache.json は取得用の内部キャッシュ（ETag 等）なので公開しない（旧版が data/out に残していた分も含む）
+files = [p for p in SRC.glob("*") if not p.is_dir() and not p.name.endswith(".cache.json")]
+with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as ex:
+    # map は入力順に返るので表示順は従来どおり
+    for p, updated in zip(files, ex.map(_sync_one, files)):
+        if updated:
+            print("updated:", p.name)
 print("sync done.")
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+pytest.importorskip("httpx")
+pytest.importorskip("selectolax")
+
+import monitor_agencies as ma
+
+
+@pytest.mark.parametrize("label", ["Windows-31J", "x-sjis", "SJIS", "Shift_JIS"])
+def test_decode_html_shift_jis_labels(label):
+    text = "林道①号線 通行止め ㈱"  # ①・㈱ は cp932 にしかない
+    body = f"<html><body><p>{text}</p></body></html>".encode("cp932")
+    got = ma.decode_html(body, f"text/html; charset={label}")
+    assert text in got
+    assert "�" not in got
+
+
+def test_decode_html_meta_windows_31j():
+    body = ('<html><head><meta charset="Windows-31J"></head>'
+            "<body>林道 全面通行止</body></html>").encode("cp932")
+    assert "林道 全面通行止" in ma.decode_html(body, "text/html")